@@ -1,8 +1,13 @@
 from src.feature_store.get_features import (
+    feature_cache,
     get_user_features,
     get_item_features,
-    get_user_item_features
+    get_user_item_features,
+    get_item_features_batch,
+    get_user_item_features_batch
 )
+from src.feature_store.feature_vectors import get_feature_vectors
+from src.utils.db import pool_metrics
 
 def demo_feature_retrieval():
     print("=== Feature Store Demo (Version v1) ===\n")
@@ -32,7 +37,34 @@ def demo_feature_retrieval():
     user_item_features = get_user_item_features(
         user_id, product_id, version="v1"
     )
-    print(user_item_features)
+    print(user_item_features, "\n")
+
+    # -------------------------------
+    # Batched retrieval for a candidate list
+    # -------------------------------
+    candidates = [1, 2, 3, 4, 5]
+    print(f"Batched Item and User-Item Features for candidates = {candidates}")
+    print(get_item_features_batch(candidates, version="v1"), "\n")
+    print(
+        get_user_item_features_batch(
+            [user_id] * len(candidates), candidates, version="v1"
+        ),
+        "\n"
+    )
+
+    print(f"Feature cache stats: {feature_cache.stats()}\n")
+
+    # -------------------------------
+    # Joined feature vectors for training/scoring
+    # -------------------------------
+    matrix, columns = get_feature_vectors(
+        [user_id] * len(candidates), candidates, version="v1"
+    )
+    print(f"Feature matrix {matrix.shape} ({matrix.dtype})")
+    print([column["name"] for column in columns])
+    print(matrix, "\n")
+
+    print(f"Connection pool metrics: {pool_metrics()}")
 
 
 if __name__ == "__main__":
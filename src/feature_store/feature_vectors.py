@@ -0,0 +1,74 @@
+import numpy as np
+import pandas as pd
+
+from src.feature_store.registry import FEATURE_REGISTRY
+from src.utils.db import get_engine
+
+CHUNK_SIZE = 10_000
+
+
+def feature_columns(version="v1"):
+    return [
+        {
+            "name": f"{group}.{feature}",
+            "group": group,
+            "feature": feature,
+            "description": description,
+        }
+        for group, spec in FEATURE_REGISTRY[version].items()
+        for feature, description in spec["features"].items()
+    ]
+
+
+def build_feature_query(version="v1"):
+    selects, joins = [], []
+
+    for n, (group, spec) in enumerate(FEATURE_REGISTRY[version].items()):
+        alias = f"g{n}"
+        on = " AND ".join(f"{alias}.{key} = k.{key}" for key in spec["keys"])
+        joins.append(f"LEFT JOIN {spec['source']} {alias} ON {on}")
+        selects.extend(
+            f'{alias}.{feature} AS "{group}.{feature}"'
+            for feature in spec["features"]
+        )
+
+    # One pass: every feature group is joined onto the requested pairs in order
+    return (
+        f"SELECT {', '.join(selects)} "
+        f"FROM unnest(%(user_ids)s, %(product_ids)s) "
+        f"WITH ORDINALITY AS k(user_id, product_id, ord) "
+        f"{' '.join(joins)} "
+        f"ORDER BY k.ord"
+    )
+
+
+def iter_feature_vectors(user_ids, product_ids, version="v1",
+                         chunk_size=CHUNK_SIZE):
+    query = build_feature_query(version)
+    user_ids = np.asarray(user_ids).tolist()
+    product_ids = np.asarray(product_ids).tolist()
+
+    for start in range(0, len(user_ids), chunk_size):
+        chunk = pd.read_sql(
+            query,
+            get_engine(),
+            params={
+                "user_ids": user_ids[start:start + chunk_size],
+                "product_ids": product_ids[start:start + chunk_size],
+            },
+        )
+        # Missing entities come back as NULL and become NaN
+        yield np.ascontiguousarray(chunk.to_numpy(dtype=np.float32))
+
+
+def get_feature_vectors(user_ids, product_ids, version="v1",
+                        chunk_size=CHUNK_SIZE):
+    columns = feature_columns(version)
+    matrix = np.empty((len(user_ids), len(columns)), dtype=np.float32)
+
+    row = 0
+    for chunk in iter_feature_vectors(user_ids, product_ids, version, chunk_size):
+        matrix[row:row + len(chunk)] = chunk
+        row += len(chunk)
+
+    return matrix, columns
@@ -1,39 +1,223 @@
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
 import pandas as pd
-from sqlalchemy import create_engine
 
-from src.utils.config_loader import load_db_config
+from src.utils.config_loader import load_paths
+from src.utils.db import get_engine
 from src.feature_store.registry import FEATURE_REGISTRY
+from src.feature_store import online_store
 
-db = load_db_config()["postgres"]
+paths = load_paths()
 
-DB_URL = (
-    f"postgresql://{db['user']}:{db['password']}"
-    f"@{db['host']}:{db['port']}/{db['database']}"
-)
+CACHE_MAX_SIZE = 100_000
+CACHE_TTL_SECONDS = 300
+# One file per feature group, rewritten by every writer of that group
+STAMP_DIR = Path(paths["features"]) / "cache_stamps"
 
-engine = create_engine(DB_URL)
 
+class FeatureCache:
+    def __init__(self, max_size=CACHE_MAX_SIZE, ttl=CACHE_TTL_SECONDS):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._stamps = {}
+        self._lock = threading.Lock()
 
-def get_user_features(user_id, version="v1"):
+    def get_many(self, keys):
+        found, missing = {}, []
+        now = time.monotonic()
+
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is not None and now - entry[0] < self.ttl:
+                    self._entries.move_to_end(key)
+                    found[key] = entry[1]
+                    self.hits += 1
+                else:
+                    if entry is not None:
+                        del self._entries[key]
+                    missing.append(key)
+                    self.misses += 1
+
+        return found, missing
+
+    def put_many(self, items):
+        now = time.monotonic()
+
+        with self._lock:
+            for key, value in items.items():
+                self._entries[key] = (now, value)
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def sync(self, group, stamp):
+        # Drop the group's entries when another process has stamped it since
+        # the last lookup
+        with self._lock:
+            changed = self._stamps.get(group, stamp) != stamp
+            self._stamps[group] = stamp
+        if changed:
+            self.invalidate(group=group)
+
+    def invalidate(self, version=None, group=None):
+        with self._lock:
+            if version is None and group is None:
+                self._entries.clear()
+                return
+            for key in list(self._entries):
+                if (version is None or key[0] == version) and \
+                        (group is None or key[1] == group):
+                    del self._entries[key]
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "size": len(self._entries),
+        }
+
+
+feature_cache = FeatureCache()
+
+
+def _stamp(group):
+    try:
+        return (STAMP_DIR / group).read_text()
+    except FileNotFoundError:
+        return None
+
+
+def invalidate_cache(version=None, group=None):
+    feature_cache.invalidate(version, group)
+
+    # Processes serving features check the stamp on each lookup, so the
+    # writer's update reaches their caches without waiting for the TTL
+    groups = [group] if group is not None else {
+        name for groups in FEATURE_REGISTRY.values() for name in groups
+    }
+    STAMP_DIR.mkdir(parents=True, exist_ok=True)
+    for name in groups:
+        (STAMP_DIR / name).write_text(str(time.time_ns()))
+
+
+def _plain(values):
+    # The DB driver adapts Python lists to arrays, but not NumPy scalars
+    return np.asarray(values).tolist()
+
+
+def _select(version, group, alias=None):
+    prefix = f"{alias}." if alias else ""
+    return ", ".join(
+        prefix + column for column in online_store.feature_columns(version, group)
+    )
+
+
+def _get_batch(group, keys, entity_ids, query_fn, version):
+    # Snapshot and PostgreSQL rows share the cache, so both return exactly
+    # the registered keys and features
+    columns = online_store.feature_columns(version, group)
+    cache_keys = [(version, group, entity_id) for entity_id in entity_ids]
+    feature_cache.sync(group, _stamp(group))
+    found, missing = feature_cache.get_many(cache_keys)
+
+    if missing:
+        missing_ids = [key[2] for key in missing]
+        # Serve from the local snapshot when one exists for this version
+        fetched = online_store.lookup(version, group, keys, missing_ids)
+        if fetched is None:
+            fetched = query_fn(missing_ids)
+        if len(keys) > 1:
+            fetched_ids = fetched[keys].itertuples(index=False, name=None)
+        else:
+            fetched_ids = fetched[keys[0]].tolist()
+        records = {
+            (version, group, entity_id): row
+            for entity_id, row in zip(fetched_ids, fetched.to_dict("records"))
+        }
+        # Absent entities are cached too, so repeated misses skip the DB
+        fetched_rows = {key: records.get(key) for key in missing}
+        feature_cache.put_many(fetched_rows)
+        found.update(fetched_rows)
+
+    rows = [found[key] for key in cache_keys if found[key] is not None]
+    return pd.DataFrame(rows, columns=columns)
+
+
+def get_user_features_batch(user_ids, version="v1"):
     table = FEATURE_REGISTRY[version]["user_features"]["source"]
-    query = f"SELECT * FROM {table} WHERE user_id = %(user_id)s"
-    return pd.read_sql(query, engine, params={"user_id": user_id})
+    query = (
+        f"SELECT {_select(version, 'user_features')} FROM {table} "
+        f"WHERE user_id = ANY(%(user_ids)s)"
+    )
+
+    return _get_batch(
+        "user_features",
+        ["user_id"],
+        _plain(user_ids),
+        lambda ids: pd.read_sql(query, get_engine(), params={"user_ids": ids}),
+        version,
+    )
 
 
-def get_item_features(product_id, version="v1"):
+def get_item_features_batch(product_ids, version="v1"):
     table = FEATURE_REGISTRY[version]["item_features"]["source"]
-    query = f"SELECT * FROM {table} WHERE product_id = %(product_id)s"
-    return pd.read_sql(query, engine, params={"product_id": product_id})
+    query = (
+        f"SELECT {_select(version, 'item_features')} FROM {table} "
+        f"WHERE product_id = ANY(%(product_ids)s)"
+    )
 
+    return _get_batch(
+        "item_features",
+        ["product_id"],
+        _plain(product_ids),
+        lambda ids: pd.read_sql(
+            query, get_engine(), params={"product_ids": ids}
+        ),
+        version,
+    )
 
-def get_user_item_features(user_id, product_id, version="v1"):
+
+def get_user_item_features_batch(user_ids, product_ids, version="v1"):
     table = FEATURE_REGISTRY[version]["user_item_features"]["source"]
     query = (
-        f"SELECT * FROM {table} "
-        f"WHERE user_id = %(user_id)s AND product_id = %(product_id)s"
+        f"SELECT {_select(version, 'user_item_features', 't')} FROM {table} t "
+        f"JOIN unnest(%(user_ids)s, %(product_ids)s) AS k(user_id, product_id) "
+        f"ON t.user_id = k.user_id AND t.product_id = k.product_id"
     )
-    return pd.read_sql(
-        query,
-        engine,
-        params={"user_id": user_id, "product_id": product_id},
+
+    return _get_batch(
+        "user_item_features",
+        ["user_id", "product_id"],
+        list(zip(_plain(user_ids), _plain(product_ids))),
+        lambda pairs: pd.read_sql(
+            query,
+            get_engine(),
+            params={
+                "user_ids": [pair[0] for pair in pairs],
+                "product_ids": [pair[1] for pair in pairs],
+            },
+        ),
+        version,
     )
+
+
+def get_user_features(user_id, version="v1"):
+    return get_user_features_batch([user_id], version)
+
+
+def get_item_features(product_id, version="v1"):
+    return get_item_features_batch([product_id], version)
+
+
+def get_user_item_features(user_id, product_id, version="v1"):
+    return get_user_item_features_batch([user_id], [product_id], version)
@@ -0,0 +1,158 @@
+import argparse
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+
+from src.utils.config_loader import load_paths
+from src.utils.db import get_engine
+from src.feature_store.registry import FEATURE_REGISTRY
+
+paths = load_paths()
+
+ONLINE_STORE_DIR = Path(paths["features"]) / "online_store"
+CHUNK_SIZE = 100_000
+# Stay well below SQLite's bound-parameter limit
+LOOKUP_BATCH = 500
+
+_local = threading.local()
+
+
+def feature_columns(version, group):
+    # The columns every feature lookup returns, whichever source serves it
+    spec = FEATURE_REGISTRY[version][group]
+    return spec["keys"] + list(spec["features"])
+
+
+def snapshot_path(version):
+    return ONLINE_STORE_DIR / f"{version}.sqlite"
+
+
+def materialize(version="v1", engine=None):
+    engine = engine or get_engine()
+
+    ONLINE_STORE_DIR.mkdir(parents=True, exist_ok=True)
+    target = snapshot_path(version)
+    staging = target.with_suffix(".sqlite.tmp")
+    staging.unlink(missing_ok=True)
+
+    conn = sqlite3.connect(staging)
+    try:
+        row_counts = {}
+        for group, spec in FEATURE_REGISTRY[version].items():
+            rows = 0
+            for chunk in pd.read_sql(
+                f"SELECT * FROM {spec['source']}", engine, chunksize=CHUNK_SIZE
+            ):
+                chunk.to_sql(group, conn, if_exists="append", index=False)
+                rows += len(chunk)
+            row_counts[group] = rows
+
+            # Keys first, then the registered features, so lookups never touch the table
+            index_columns = spec["keys"] + list(spec["features"])
+            conn.execute(
+                f"CREATE INDEX idx_{group}_lookup "
+                f"ON {group} ({', '.join(index_columns)})"
+            )
+
+        conn.execute("CREATE TABLE snapshot_metadata (key TEXT, value TEXT)")
+        conn.executemany(
+            "INSERT INTO snapshot_metadata VALUES (?, ?)",
+            [
+                ("version", version),
+                ("materialized_at", datetime.now().isoformat()),
+                ("registry", json.dumps(FEATURE_REGISTRY[version])),
+                ("row_counts", json.dumps(row_counts)),
+            ],
+        )
+        conn.execute("ANALYZE")
+        conn.commit()
+    finally:
+        conn.close()
+
+    os.replace(staging, target)
+    return target, row_counts
+
+
+def discard(source):
+    # Called by the table writers: a snapshot taken before the source table
+    # changed would keep serving old rows, so lookups go back to PostgreSQL
+    # until the snapshot is re-materialized
+    for version, groups in FEATURE_REGISTRY.items():
+        if any(spec["source"] == source for spec in groups.values()):
+            snapshot_path(version).unlink(missing_ok=True)
+
+
+def _matches_registry(conn, version):
+    try:
+        row = conn.execute(
+            "SELECT value FROM snapshot_metadata WHERE key = 'registry'"
+        ).fetchone()
+    except sqlite3.Error:
+        return False
+    return row is not None and json.loads(row[0]) == FEATURE_REGISTRY[version]
+
+
+def _connection(version):
+    path = snapshot_path(version)
+    try:
+        mtime = path.stat().st_mtime
+    except FileNotFoundError:
+        return None
+
+    connections = getattr(_local, "connections", None)
+    if connections is None:
+        connections = _local.connections = {}
+
+    # A re-materialized snapshot replaces the file, so reopen when it changes
+    cached = connections.get(version)
+    if cached is None or cached[0] != mtime:
+        if cached is not None and cached[1] is not None:
+            cached[1].close()
+        conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        # A snapshot of another registry definition is never served
+        if not _matches_registry(conn, version):
+            conn.close()
+            conn = None
+        connections[version] = (mtime, conn)
+        return conn
+    return cached[1]
+
+
+def lookup(version, group, keys, entity_ids):
+    conn = _connection(version)
+    if conn is None:
+        return None
+
+    columns = feature_columns(version, group)
+    select = f"SELECT {', '.join(columns)} FROM {group} WHERE "
+    rows = []
+
+    for start in range(0, len(entity_ids), LOOKUP_BATCH):
+        batch = entity_ids[start:start + LOOKUP_BATCH]
+        if len(keys) == 1:
+            where = f"{keys[0]} IN ({', '.join('?' * len(batch))})"
+            params = list(batch)
+        else:
+            row = f"({', '.join('?' * len(keys))})"
+            where = (
+                f"({', '.join(keys)}) IN "
+                f"(VALUES {', '.join([row] * len(batch))})"
+            )
+            params = [value for entity in batch for value in entity]
+        rows.extend(conn.execute(select + where, params).fetchall())
+
+    return pd.DataFrame(rows, columns=columns)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--version", default="v1")
+    args = parser.parse_args()
+
+    target, row_counts = materialize(args.version)
+    print(f"Online store snapshot written to {target}: {row_counts}")
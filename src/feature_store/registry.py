@@ -2,6 +2,7 @@ FEATURE_REGISTRY = {
     "v1": {
         "user_features": {
             "source": "user_features",
+            "keys": ["user_id"],
             "features": {
                 "total_interactions": "Count of user interactions",
                 "avg_interaction_score": "Average interaction strength per user"
@@ -9,6 +10,7 @@ FEATURE_REGISTRY = {
         },
         "item_features": {
             "source": "item_features",
+            "keys": ["product_id"],
             "features": {
                 "total_interactions": "Total interactions for item",
                 "avg_interaction_score": "Average interaction strength for item",
@@ -17,6 +19,7 @@ FEATURE_REGISTRY = {
         },
         "user_item_features": {
             "source": "user_item_features",
+            "keys": ["user_id", "product_id"],
             "features": {
                 "interaction_count": "User-item interaction count",
                 "total_interaction_score": "Cumulative interaction score"
@@ -24,3 +27,29 @@ FEATURE_REGISTRY = {
         }
     }
 }
+
+# v2 adds streaming, time-windowed behaviour on top of the v1 aggregates
+FEATURE_REGISTRY["v2"] = {
+    **FEATURE_REGISTRY["v1"],
+    "user_window_features": {
+        "source": "user_window_features",
+        "keys": ["user_id"],
+        "features": {
+            "events_1h": "User events, exponentially decayed with a 1h time constant",
+            "events_24h": "User events, exponentially decayed with a 24h time constant",
+            "events_7d": "User events, exponentially decayed with a 7d time constant",
+            "seconds_since_last_event": "Seconds between the user's last event and the feature watermark",
+            "session_count": "User sessions (30 min inactivity gap)"
+        }
+    },
+    "item_window_features": {
+        "source": "item_window_features",
+        "keys": ["product_id"],
+        "features": {
+            "events_1h": "Item events, exponentially decayed with a 1h time constant",
+            "events_24h": "Item events, exponentially decayed with a 24h time constant",
+            "events_7d": "Item events, exponentially decayed with a 7d time constant",
+            "seconds_since_last_event": "Seconds between the item's last event and the feature watermark"
+        }
+    }
+}
@@ -0,0 +1,68 @@
+import argparse
+from pathlib import Path
+
+from src.utils.logger import get_logger
+from src.utils.config_loader import load_paths
+from src.utils import raw_reader
+from src.utils.paths import hive_partition_dir, list_partitions
+
+paths = load_paths()
+
+LOG_FILE = Path(paths["logs"]) / "ingestion.log"
+logger = get_logger("raw_parquet_conversion", LOG_FILE)
+
+
+def convert_clickstream(overwrite=False, remove_source=False):
+    converted = []
+
+    for day, path in list_partitions(raw_reader.CLICKSTREAM_ROOT, "clickstream.csv"):
+        target = hive_partition_dir(raw_reader.CLICKSTREAM_ROOT, day) / "clickstream.parquet"
+        if target.exists() and not overwrite:
+            continue
+
+        df = raw_reader.read_clickstream_partition(path)
+        raw_reader.write_parquet_partition(
+            df, raw_reader.CLICKSTREAM_ROOT, day, "clickstream.parquet"
+        )
+        converted.append(target)
+        logger.info(f"Converted {path} to {target}")
+
+        if remove_source:
+            path.unlink()
+
+    return converted
+
+
+def convert_products(overwrite=False, remove_source=False):
+    converted = []
+
+    for day, path in list_partitions(raw_reader.PRODUCTS_ROOT, "products.json"):
+        target = hive_partition_dir(raw_reader.PRODUCTS_ROOT, day) / "products.parquet"
+        if target.exists() and not overwrite:
+            continue
+
+        df = raw_reader.read_products_partition(path)
+        raw_reader.write_parquet_partition(
+            df, raw_reader.PRODUCTS_ROOT, day, "products.parquet"
+        )
+        converted.append(target)
+        logger.info(f"Converted {path} to {target}")
+
+        if remove_source:
+            path.unlink()
+
+    return converted
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--overwrite", action="store_true")
+    parser.add_argument("--remove-source", action="store_true")
+    args = parser.parse_args()
+
+    clickstream = convert_clickstream(args.overwrite, args.remove_source)
+    products = convert_products(args.overwrite, args.remove_source)
+    print(
+        f"Converted {len(clickstream)} clickstream and "
+        f"{len(products)} product partitions to Parquet"
+    )
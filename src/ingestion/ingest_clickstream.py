@@ -1,8 +1,11 @@
+import argparse
+import hashlib
 import shutil
 from datetime import datetime
 from pathlib import Path
 from src.utils.logger import get_logger
 from src.utils.config_loader import load_paths
+from src.utils.json_store import read_json, write_json
 
 paths = load_paths()
 
@@ -11,20 +14,175 @@ logger = get_logger("clickstream_ingestion", LOG_FILE)
 
 RAW_DATA_PATH = Path(paths["raw"]) / "clickstream"
 SOURCE_FILE = Path(paths["source_files"]) / "clickstream.csv"
+STATE_FILE = RAW_DATA_PATH / "_state.json"
+RAW_FORMATS = {"csv": ("csv",), "parquet": ("parquet",), "both": ("csv", "parquet")}
+BLOCK_SIZE = 1 << 20
 
 
-def ingest_clickstream():
+def ingest_clickstream(formats=("csv",)):
     try:
         logger.info("Starting clickstream ingestion")
 
         today = datetime.now()
-        target_dir = RAW_DATA_PATH / today.strftime("%Y/%m/%d")
+
+        if "csv" in formats:
+            target_dir = RAW_DATA_PATH / today.strftime("%Y/%m/%d")
+            target_dir.mkdir(parents=True, exist_ok=True)
+
+            target_file = target_dir / "clickstream.csv"
+            shutil.copy(SOURCE_FILE, target_file)
+
+            logger.info(f"Clickstream data ingested successfully at {target_file}")
+
+        if "parquet" in formats:
+            import pandas as pd
+            from src.utils.raw_reader import clickstream_to_parquet
+
+            target_file = clickstream_to_parquet(
+                pd.read_csv(SOURCE_FILE), today.date()
+            )
+            logger.info(f"Clickstream data ingested successfully at {target_file}")
+
+    except Exception as e:
+        logger.error(f"Clickstream ingestion failed: {e}")
+        raise
+
+
+def prefix_digest(path, length, block_size=BLOCK_SIZE):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while length > 0:
+            block = f.read(min(block_size, length))
+            if not block:
+                break
+            digest.update(block)
+            length -= len(block)
+    return digest.hexdigest()
+
+
+def load_state():
+    return read_json(STATE_FILE, {})
+
+
+def save_state(state):
+    write_json(STATE_FILE, state)
+
+
+def read_new_rows(source, offset):
+    with open(source, "rb") as f:
+        header = f.readline()
+        f.seek(max(offset, len(header)))
+        data = f.read()
+
+    # A trailing partial line is still being written; take it on the next run
+    complete = data.rfind(b"\n") + 1
+    return header, data[:complete], max(offset, len(header)) + complete
+
+
+def _row_keys(df):
+    # Canonical text form, so CSV and Parquet copies of a row hash the same
+    import pandas as pd
+
+    columns = ["user_id", "product_id", "event_type", "timestamp", "device"]
+    df = df[columns].astype("string").fillna("")
+    return pd.util.hash_pandas_object(df, index=False).to_numpy()
+
+
+def drop_ingested_rows(header, rows):
+    import io
+    import numpy as np
+    import pandas as pd
+    from src.utils import raw_reader
+
+    lines = rows.splitlines(keepends=True)
+    new = raw_reader.read_clickstream_partition(io.BytesIO(header + rows))
+    history = raw_reader.load_clickstream()
+    if history.empty:
+        return rows
+
+    # A row seen k times in the raw zone is skipped for its first k occurrences
+    seen = pd.Series(_row_keys(history)).value_counts()
+    keys = pd.Series(_row_keys(new))
+    occurrence = keys.groupby(keys).cumcount().to_numpy()
+    keep = occurrence >= keys.map(seen).fillna(0).to_numpy()
+
+    return b"".join(line for line, kept in zip(lines, np.asarray(keep)) if kept)
+
+
+def append_partition(header, rows, day, formats):
+    target_files = []
+    target_dir = RAW_DATA_PATH / day.strftime("%Y/%m/%d")
+    csv_file = target_dir / "clickstream.csv"
+
+    if "parquet" in formats:
+        import io
+        import pandas as pd
+        from src.utils import raw_reader
+
+        # Rows already stored for the day, read before the CSV is appended to;
+        # Parquet is preferred by readers, so it must hold the CSV rows as well
+        existing = raw_reader.clickstream_partitions(day.date(), day.date())
+        earlier = [raw_reader.read_clickstream_partition(existing[0][1])] if existing else []
+
+    if "csv" in formats:
         target_dir.mkdir(parents=True, exist_ok=True)
 
-        target_file = target_dir / "clickstream.csv"
-        shutil.copy(SOURCE_FILE, target_file)
+        # Several runs on one day append to the same partition
+        exists = csv_file.exists()
+        with open(csv_file, "ab") as f:
+            if not exists:
+                f.write(header)
+            f.write(rows)
+        target_files.append(csv_file)
 
-        logger.info(f"Clickstream data ingested successfully at {target_file}")
+    if "parquet" in formats:
+        new_rows = raw_reader.read_clickstream_partition(io.BytesIO(header + rows))
+        target_files.append(raw_reader.clickstream_to_parquet(
+            pd.concat(earlier + [new_rows], ignore_index=True), day.date()
+        ))
+
+    return target_files
+
+
+def ingest_clickstream_incremental(source=SOURCE_FILE, formats=("csv",)):
+    try:
+        logger.info("Starting incremental clickstream ingestion")
+
+        state = load_state()
+        source_state = state.get(str(source), {"offset": 0, "digest": None})
+        offset = source_state["offset"]
+        size = source.stat().st_size
+
+        # The already ingested prefix must be byte-identical for an append
+        if offset and (size < offset or
+                       prefix_digest(source, offset) != source_state["digest"]):
+            logger.warning(f"{source} was rewritten, ingesting only rows not stored yet")
+            offset = 0
+        elif size == offset:
+            logger.info(f"{source} is unchanged, nothing to ingest")
+            return []
+
+        header, rows, new_offset = read_new_rows(source, offset)
+        if rows and offset == 0 and str(source) in state:
+            # A rewritten source mostly repeats history that is already stored
+            rows = drop_ingested_rows(header, rows)
+
+        target_files = []
+        if rows:
+            target_files = append_partition(header, rows, datetime.now(), formats)
+            row_count = rows.count(b"\n")
+            for target_file in target_files:
+                logger.info(f"Appended {row_count} clickstream rows at {target_file}")
+        else:
+            logger.info(f"{source} has no complete new rows")
+
+        state[str(source)] = {
+            "offset": new_offset,
+            "digest": prefix_digest(source, new_offset),
+            "ingested_at": datetime.now().isoformat(),
+        }
+        save_state(state)
+        return target_files
 
     except Exception as e:
         logger.error(f"Clickstream ingestion failed: {e}")
@@ -32,4 +190,12 @@ def ingest_clickstream():
 
 
 if __name__ == "__main__":
-    ingest_clickstream()
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--format", choices=sorted(RAW_FORMATS), default="csv")
+    parser.add_argument("--mode", choices=["full", "incremental"], default="full")
+    args = parser.parse_args()
+
+    if args.mode == "incremental":
+        ingest_clickstream_incremental(formats=RAW_FORMATS[args.format])
+    else:
+        ingest_clickstream(RAW_FORMATS[args.format])
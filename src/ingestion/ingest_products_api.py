@@ -1,12 +1,18 @@
+import argparse
 import json
+import random
 import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from pathlib import Path
+from urllib.parse import quote
 
 import requests
+from requests.adapters import HTTPAdapter
 
 from src.utils.logger import get_logger
 from src.utils.config_loader import load_paths
+from src.utils.json_store import read_json, write_json
 
 paths = load_paths()
 
@@ -14,10 +20,97 @@ LOG_FILE = Path(paths["logs"]) / "ingestion.log"
 logger = get_logger("product_ingestion", LOG_FILE)
 
 RAW_DATA_PATH = Path(paths["raw"]) / "products"
+STATE_FILE = RAW_DATA_PATH / "_state.json"
 PRODUCTS_API_URL = "https://fakestoreapi.com/products"
+RAW_FORMATS = {"json": ("json",), "parquet": ("parquet",), "both": ("json", "parquet")}
 
+MAX_WORKERS = 8
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 30.0
 
-def ingest_products(retries=3, timeout=10):
+
+def backoff_delay(attempt, base=BACKOFF_BASE, cap=BACKOFF_MAX):
+    # Full jitter keeps concurrent retries from hitting the API in lockstep
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+def make_session(pool_size=MAX_WORKERS):
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+# Conditional GET: returns (payload, validators), with payload None on a 304
+def fetch_json(session, url, validators=None, retries=3, timeout=10):
+    validators = validators or {}
+    headers = {}
+    if validators.get("etag"):
+        headers["If-None-Match"] = validators["etag"]
+    if validators.get("last_modified"):
+        headers["If-Modified-Since"] = validators["last_modified"]
+
+    for attempt in range(retries):
+        try:
+            response = session.get(url, headers=headers, timeout=timeout)
+            if response.status_code == 304:
+                return None, validators
+
+            response.raise_for_status()
+            return response.json(), {
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+            }
+
+        except Exception as e:
+            logger.error(f"Attempt {attempt + 1} for {url} failed: {e}")
+            if attempt + 1 < retries:
+                time.sleep(backoff_delay(attempt))
+
+    raise RuntimeError(f"Fetching {url} failed after {retries} attempts")
+
+
+def load_state():
+    return read_json(
+        STATE_FILE, {"validators": {}, "categories": [], "products": {}}
+    )
+
+
+def save_state(state):
+    write_json(STATE_FILE, state, compact=True)
+
+
+def write_snapshot(products, day, formats=("json",)):
+    target_files = []
+
+    if "json" in formats:
+        target_dir = RAW_DATA_PATH / day.strftime("%Y/%m/%d")
+        target_dir.mkdir(parents=True, exist_ok=True)
+
+        target_file = target_dir / "products.json"
+        with open(target_file, "w") as f:
+            json.dump(products, f, separators=(",", ":"))
+        target_files.append(target_file)
+
+    if "parquet" in formats:
+        from src.utils.raw_reader import products_to_parquet
+
+        target_files.append(products_to_parquet(products, day.date()))
+
+    return target_files
+
+
+def diff_catalogue(previous, current):
+    upserted = [
+        product for product_id, product in current.items()
+        if previous.get(product_id) != product
+    ]
+    removed = sorted(set(previous) - set(current), key=int)
+    return upserted, removed
+
+
+def ingest_products(retries=3, timeout=10, formats=("json",)):
     attempt = 0
 
     while attempt < retries:
@@ -29,27 +122,89 @@ def ingest_products(retries=3, timeout=10):
 
             products = response.json()
 
-            today = datetime.now()
-            target_dir = RAW_DATA_PATH / today.strftime("%Y/%m/%d")
-            target_dir.mkdir(parents=True, exist_ok=True)
-
-            target_file = target_dir / "products.json"
-            with open(target_file, "w") as f:
-                json.dump(products, f, indent=2)
-
-            logger.info(
-                f"Product data ingested successfully from API at {target_file}"
-            )
+            for target_file in write_snapshot(products, datetime.now(), formats):
+                logger.info(
+                    f"Product data ingested successfully from API at {target_file}"
+                )
             return
 
         except Exception as e:
+            logger.error(f"Attempt {attempt + 1} failed: {e}")
             attempt += 1
-            logger.error(f"Attempt {attempt} failed: {e}")
-            time.sleep(2)
+            if attempt < retries:
+                time.sleep(backoff_delay(attempt - 1))
 
     logger.error("Product ingestion failed after retries")
     raise RuntimeError("Product ingestion failed")
 
 
+def ingest_products_incremental(base_url=PRODUCTS_API_URL, max_workers=MAX_WORKERS,
+                                retries=3, timeout=10, formats=("json",)):
+    logger.info("Starting incremental product API ingestion")
+
+    state = load_state()
+    validators = state["validators"]
+    previous = state["products"]
+
+    with make_session(max_workers) as session:
+        categories_url = f"{base_url}/categories"
+        categories, validators[categories_url] = fetch_json(
+            session, categories_url, validators.get(categories_url), retries, timeout
+        )
+        categories = state["categories"] if categories is None else categories
+
+        def fetch_category(category):
+            url = f"{base_url}/category/{quote(category)}"
+            return url, fetch_json(session, url, validators.get(url), retries, timeout)
+
+        # Category slices are fetched concurrently over the shared connection pool
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            slices = list(zip(categories, executor.map(fetch_category, categories)))
+
+    current = {}
+    for category, (url, (products, slice_validators)) in slices:
+        validators[url] = slice_validators
+        if products is None:
+            # Not modified: carry the category over from the last snapshot
+            products = [p for p in previous.values() if p.get("category") == category]
+        current.update({str(p["id"]): p for p in products})
+
+    upserted, removed = diff_catalogue(previous, current)
+    today = datetime.now()
+
+    if upserted or removed:
+        target_dir = RAW_DATA_PATH / today.strftime("%Y/%m/%d")
+        target_dir.mkdir(parents=True, exist_ok=True)
+        delta_file = target_dir / f"products_delta_{today.strftime('%H%M%S%f')}.json"
+        with open(delta_file, "w") as f:
+            json.dump({"upserted": upserted, "removed": removed}, f,
+                      separators=(",", ":"))
+
+        snapshot = sorted(current.values(), key=lambda p: p["id"])
+        for target_file in write_snapshot(snapshot, today, formats):
+            logger.info(f"Product snapshot written at {target_file}")
+
+    logger.info(
+        f"Incremental product ingestion done: {len(upserted)} changed, "
+        f"{len(removed)} removed"
+    )
+
+    state.update(validators=validators, categories=categories, products=current)
+    save_state(state)
+    return upserted, removed
+
+
 if __name__ == "__main__":
-    ingest_products()
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--format", choices=sorted(RAW_FORMATS), default="json")
+    parser.add_argument("--mode", choices=["full", "incremental"], default="full")
+    parser.add_argument("--base-url", default=PRODUCTS_API_URL)
+    parser.add_argument("--max-workers", type=int, default=MAX_WORKERS)
+    args = parser.parse_args()
+
+    if args.mode == "incremental":
+        ingest_products_incremental(
+            args.base_url, args.max_workers, formats=RAW_FORMATS[args.format]
+        )
+    else:
+        ingest_products(formats=RAW_FORMATS[args.format])
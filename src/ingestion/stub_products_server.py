@@ -0,0 +1,147 @@
+import hashlib
+import json
+import tempfile
+import threading
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import unquote
+
+from src.utils.config_loader import load_paths
+
+paths = load_paths()
+
+SOURCE_FILE = Path(paths["source_files"]) / "products.json"
+
+
+class StubCatalogue:
+    # Serves /products/categories and /products/category/<name> with ETags,
+    # like the fakestore API, and records the requests it receives
+    def __init__(self, products):
+        self.products = products
+        self.requests = []
+        self.fail_next = 0
+        self._lock = threading.Lock()
+
+    def handler(self):
+        catalogue = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                with catalogue._lock:
+                    catalogue.requests.append(
+                        (self.path, self.headers.get("If-None-Match"))
+                    )
+                    if catalogue.fail_next:
+                        catalogue.fail_next -= 1
+                        self.send_response(503)
+                        self.end_headers()
+                        return
+                    products = list(catalogue.products)
+
+                if self.path.endswith("/categories"):
+                    body = sorted({p["category"] for p in products})
+                else:
+                    category = unquote(self.path.rsplit("/", 1)[1])
+                    body = [p for p in products if p["category"] == category]
+
+                data = json.dumps(body).encode()
+                etag = f'"{hashlib.md5(data).hexdigest()}"'
+                if self.headers.get("If-None-Match") == etag:
+                    self.send_response(304)
+                    self.end_headers()
+                    return
+
+                self.send_response(200)
+                self.send_header("ETag", etag)
+                self.send_header("Content-Type", "application/json")
+                self.end_headers()
+                self.wfile.write(data)
+
+        return Handler
+
+
+def serve(catalogue):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), catalogue.handler())
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}/products"
+
+
+class CheckFailed(RuntimeError):
+    pass
+
+
+def check(condition, message):
+    # Explicit, so the checks still run under python -O
+    if not condition:
+        raise CheckFailed(message)
+
+
+@contextmanager
+def scratch_ingestion(ingest):
+    # Raw output and state go to a scratch directory, never to data/raw
+    saved = (ingest.RAW_DATA_PATH, ingest.STATE_FILE, ingest.backoff_delay)
+    with tempfile.TemporaryDirectory() as scratch:
+        ingest.RAW_DATA_PATH = Path(scratch)
+        ingest.STATE_FILE = Path(scratch) / "_state.json"
+        ingest.backoff_delay = lambda attempt: 0
+        try:
+            yield Path(scratch)
+        finally:
+            ingest.RAW_DATA_PATH, ingest.STATE_FILE, ingest.backoff_delay = saved
+
+
+def run_checks():
+    from src.ingestion import ingest_products_api as ingest
+
+    with open(SOURCE_FILE) as f:
+        catalogue = StubCatalogue(json.load(f))
+    server, base_url = serve(catalogue)
+
+    def ingest_once(max_workers=4):
+        return ingest.ingest_products_incremental(base_url, max_workers=max_workers)
+
+    try:
+        with scratch_ingestion(ingest) as scratch:
+            upserted, removed = ingest_once()
+            check(
+                len(upserted) == len(catalogue.products) and not removed,
+                f"initial load: {len(upserted)} upserted, {len(removed)} removed",
+            )
+
+            # Unchanged catalogue: every slice is answered with 304, nothing is written
+            catalogue.requests.clear()
+            upserted, removed = ingest_once()
+            check(not upserted and not removed,
+                  "unchanged catalogue produced a delta")
+            check(all(etag for _, etag in catalogue.requests),
+                  "a request was sent without If-None-Match")
+
+            # One changed price and one removed product show up in the delta
+            catalogue.products[0] = {**catalogue.products[0], "price": 1.0}
+            dropped = catalogue.products.pop()
+            upserted, removed = ingest_once()
+            check([p["id"] for p in upserted] == [catalogue.products[0]["id"]],
+                  f"expected one changed product, got {[p['id'] for p in upserted]}")
+            check(removed == [str(dropped["id"])],
+                  f"expected product {dropped['id']} removed, got {removed}")
+
+            # Transient server errors are retried
+            catalogue.fail_next = 2
+            ingest_once(max_workers=1)
+
+            snapshots = list(scratch.glob("*/*/*/products.json"))
+            deltas = list(scratch.glob("*/*/*/products_delta_*.json"))
+            check(len(deltas) == 2, f"expected 2 delta files, found {len(deltas)}")
+    finally:
+        server.shutdown()
+
+    return {"snapshots": len(snapshots), "deltas": len(deltas),
+            "requests": len(catalogue.requests)}
+
+
+if __name__ == "__main__":
+    print(f"Stub server checks passed: {run_checks()}")
@@ -0,0 +1,77 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from scipy import sparse
+
+BLOCK_SIZE = 512
+
+
+def _solve_block(matrix, fixed, gram, regularization, alpha, start, stop):
+    block = matrix[start:stop]
+    n_factors = fixed.shape[1]
+
+    # A_u = YtY + lambda*I + sum_i (c_ui - 1) y_i y_i^T, b_u = sum_i c_ui y_i,
+    # with c_ui = 1 + alpha * r_ui. The confidence term only needs the rows of
+    # Y this block observed, so memory is O(nnz(block) * k), never O(n * k^2)
+    observed = fixed[block.indices]
+    weighted = observed * (alpha * block.data)[:, None]
+    A = np.empty((block.shape[0], n_factors, n_factors))
+    for row, (lo, hi) in enumerate(zip(block.indptr[:-1], block.indptr[1:])):
+        A[row] = weighted[lo:hi].T @ observed[lo:hi]
+    A += gram + regularization * np.eye(n_factors)
+
+    weights = block.copy()
+    weights.data = alpha * block.data + 1.0
+    b = weights @ fixed
+
+    return np.linalg.solve(A, b[:, :, None])[:, :, 0]
+
+
+def _solve_side(matrix, fixed, regularization, alpha, pool, block_size):
+    gram = fixed.T @ fixed
+    ranges = [
+        (start, min(start + block_size, matrix.shape[0]))
+        for start in range(0, matrix.shape[0], block_size)
+    ]
+    blocks = pool.map(
+        lambda r: _solve_block(matrix, fixed, gram, regularization, alpha, *r),
+        ranges,
+    )
+    return np.vstack(list(blocks))
+
+
+def fit_als(matrix, n_components=10, regularization=0.1, alpha=40.0,
+            iterations=15, workers=None, block_size=BLOCK_SIZE, seed=42):
+    # Only observed entries are touched; zeros are low-confidence negatives
+    user_items = sparse.csr_matrix(matrix, dtype=np.float64, copy=True)
+    user_items.eliminate_zeros()
+    item_users = user_items.T.tocsr()
+
+    rng = np.random.default_rng(seed)
+    user_factors = rng.normal(0, 0.01, (user_items.shape[0], n_components))
+    item_factors = rng.normal(0, 0.01, (user_items.shape[1], n_components))
+
+    # NumPy's linear algebra releases the GIL, so threads solve blocks in parallel
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for _ in range(iterations):
+            user_factors = _solve_side(
+                user_items, item_factors, regularization, alpha, pool, block_size
+            )
+            item_factors = _solve_side(
+                item_users, user_factors, regularization, alpha, pool, block_size
+            )
+
+    # Same layout as TruncatedSVD: scores = user_factors @ item_factors
+    return user_factors, item_factors.T
+
+
+def fold_in_als(matrix, item_factors, regularization=0.1, alpha=40.0,
+                workers=None, block_size=BLOCK_SIZE):
+    # One user half-step against fixed item factors (item_factors is k x n_items)
+    user_items = sparse.csr_matrix(matrix, dtype=np.float64, copy=True)
+    fixed = np.asarray(item_factors, dtype=np.float64).T
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return _solve_side(
+            user_items, fixed, regularization, alpha, pool, block_size
+        )
@@ -0,0 +1,164 @@
+import time
+import numpy as np
+
+ANN_INDEX_PATH = "src/models/ann_index.npz"
+DEFAULT_N_PROBE = 4
+
+
+def _kmeans(vectors, n_lists, n_iter=20, seed=42):
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), n_lists, replace=False)].copy()
+
+    for _ in range(n_iter):
+        # Squared L2 distance without materialising pairwise differences
+        dist = (
+            (vectors ** 2).sum(axis=1)[:, None]
+            - 2 * vectors @ centroids.T
+            + (centroids ** 2).sum(axis=1)[None, :]
+        )
+        assignment = dist.argmin(axis=1)
+
+        for c in range(n_lists):
+            members = vectors[assignment == c]
+            if len(members):
+                centroids[c] = members.mean(axis=0)
+
+    return centroids, assignment
+
+
+class IVFIndex:
+    def __init__(self, centroids, list_offsets, item_ids, item_vectors,
+                 model=None):
+        self.centroids = centroids
+        self.list_offsets = list_offsets
+        self.item_ids = item_ids
+        self.item_vectors = item_vectors
+        # Identifies the model artifact the index was built from
+        self.model = model or {}
+
+    @classmethod
+    def build(cls, item_vectors, n_lists=None, n_iter=20, seed=42):
+        item_vectors = np.ascontiguousarray(item_vectors, dtype=np.float32)
+        if n_lists is None:
+            n_lists = max(1, int(np.sqrt(len(item_vectors))))
+        n_lists = min(n_lists, len(item_vectors))
+
+        centroids, assignment = _kmeans(item_vectors, n_lists, n_iter, seed)
+
+        # Store items grouped by inverted list so each probe is a contiguous slice
+        item_ids = np.argsort(assignment, kind="stable")
+        counts = np.bincount(assignment, minlength=n_lists)
+        list_offsets = np.concatenate([[0], np.cumsum(counts)])
+
+        return cls(centroids, list_offsets, item_ids, item_vectors[item_ids])
+
+    @property
+    def n_lists(self):
+        return len(self.centroids)
+
+    def search(self, query, top_k=5, n_probe=DEFAULT_N_PROBE):
+        n_probe = min(n_probe, self.n_lists)
+        lists = np.argsort(self.centroids @ query)[::-1][:n_probe]
+
+        candidates = np.concatenate([
+            np.arange(self.list_offsets[c], self.list_offsets[c + 1])
+            for c in lists
+        ])
+        scores = self.item_vectors[candidates] @ query
+
+        k = min(top_k, len(candidates))
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best])]
+        return self.item_ids[candidates[best]], scores[best]
+
+    def matches(self, manifest):
+        return (
+            self.model.get("created_at") is not None
+            and self.model.get("created_at") == manifest.get("created_at")
+            and self.model.get("n_items") == manifest.get("n_items")
+        )
+
+    def save(self, path=ANN_INDEX_PATH, manifest=None):
+        if manifest is not None:
+            self.model = {
+                "created_at": manifest["created_at"],
+                "n_items": manifest["n_items"],
+            }
+        np.savez(
+            path,
+            centroids=self.centroids,
+            list_offsets=self.list_offsets,
+            item_ids=self.item_ids,
+            item_vectors=self.item_vectors,
+            model_created_at=np.str_(self.model.get("created_at", "")),
+            model_n_items=np.int64(self.model.get("n_items", -1)),
+        )
+
+    @classmethod
+    def load(cls, path=ANN_INDEX_PATH):
+        with np.load(path) as data:
+            model = {}
+            # Indexes saved before models were stamped match no model
+            if "model_created_at" in data.files and str(data["model_created_at"]):
+                model = {
+                    "created_at": str(data["model_created_at"]),
+                    "n_items": int(data["model_n_items"]),
+                }
+            return cls(
+                data["centroids"],
+                data["list_offsets"],
+                data["item_ids"],
+                data["item_vectors"],
+                model,
+            )
+
+
+def benchmark_recall(index, user_factors, item_factors, top_k=10,
+                     n_probe_values=(1, 2, 4, 8), n_queries=1000, seed=42):
+    rng = np.random.default_rng(seed)
+    queries = user_factors[
+        rng.choice(len(user_factors), min(n_queries, len(user_factors)),
+                   replace=False)
+    ].astype(np.float32)
+    item_factors = np.ascontiguousarray(item_factors, dtype=np.float32)
+
+    from src.models.inference import top_k_indices
+
+    # Timed the way Recommender.recommend scores exactly
+    start = time.perf_counter()
+    exact = [top_k_indices(item_factors @ q, top_k) for q in queries]
+    exact_time = time.perf_counter() - start
+
+    results = []
+    for n_probe in n_probe_values:
+        start = time.perf_counter()
+        approx = [index.search(q, top_k, n_probe)[0] for q in queries]
+        ann_time = time.perf_counter() - start
+
+        hits = [len(set(a) & set(e)) for a, e in zip(approx, exact)]
+        results.append({
+            "n_probe": n_probe,
+            f"recall_at_{top_k}": float(np.mean(hits)) / min(top_k, len(item_factors)),
+            "speedup": exact_time / ann_time if ann_time else float("inf"),
+        })
+
+    return results
+
+
+if __name__ == "__main__":
+    import sys
+
+    from src.models.inference import get_recommender
+
+    state = get_recommender()._state
+    index = state["index"]
+    if index is None:
+        sys.exit(
+            f"No ANN index for the current model at {ANN_INDEX_PATH}; it is "
+            f"built by `python -m src.models.train_model`, so retrain first"
+        )
+
+    for row in benchmark_recall(
+        index, state["user_factors"], state["item_factors"].T
+    ):
+        print(row)
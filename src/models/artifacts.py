@@ -0,0 +1,215 @@
+import json
+import os
+import pickle
+import shutil
+import time
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+from scipy import sparse
+
+ARTIFACT_DIR = "src/models/svd_model"
+LEGACY_MODEL_PATH = "src/models/svd_model.pkl"
+FORMAT_VERSION = 1
+MANIFEST_FILE = "manifest.json"
+
+ARRAY_FILES = {
+    "user_ids": "user_ids.npy",
+    "item_ids": "item_ids.npy",
+    "user_factors": "user_factors.npy",
+    "item_factors": "item_factors.npy",
+    "interactions_data": "interactions_data.npy",
+    "interactions_indices": "interactions_indices.npy",
+    "interactions_indptr": "interactions_indptr.npy",
+}
+
+
+def _plain_ids(ids):
+    # Object arrays would need pickle; store string ids as fixed-width unicode
+    ids = np.asarray(ids)
+    if ids.dtype == object:
+        ids = ids.astype(str)
+    return ids
+
+
+def _resolve(directory, attempts=20, delay=0.05):
+    # The published path is only missing for the instant a directory from
+    # before versioned publishing is migrated, so readers wait it out. The
+    # resolved version directory is then read as a whole, never a mix of two
+    directory = Path(directory)
+    for _ in range(attempts - 1):
+        if os.path.lexists(directory):
+            break
+        time.sleep(delay)
+    return directory.resolve()
+
+
+def save_artifacts(directory, user_ids, item_ids, user_factors, item_factors,
+                   interactions, params=None):
+    directory = Path(directory)
+    version = f"{directory.name}.v{datetime.now():%Y%m%d%H%M%S%f}"
+    staging = directory.with_name(version)
+    staging.mkdir(parents=True)
+
+    user_ids, item_ids = _plain_ids(user_ids), _plain_ids(item_ids)
+    user_factors, item_factors = np.asarray(user_factors), np.asarray(item_factors)
+    interactions = sparse.csr_matrix(interactions, dtype=np.float32)
+
+    # encode_ids relies on sorted ids; trainers already produce them in order
+    user_order = np.argsort(user_ids, kind="stable")
+    item_order = np.argsort(item_ids, kind="stable")
+    if np.any(user_order != np.arange(len(user_ids))):
+        user_ids, user_factors = user_ids[user_order], user_factors[user_order]
+        interactions = interactions[user_order]
+    if np.any(item_order != np.arange(len(item_ids))):
+        item_ids, item_factors = item_ids[item_order], item_factors[:, item_order]
+        interactions = interactions[:, item_order]
+    interactions.sort_indices()
+
+    arrays = {
+        "user_ids": user_ids,
+        "item_ids": item_ids,
+        "user_factors": np.ascontiguousarray(user_factors, dtype=np.float32),
+        "item_factors": np.ascontiguousarray(item_factors, dtype=np.float32),
+        "interactions_data": interactions.data,
+        "interactions_indices": interactions.indices,
+        "interactions_indptr": interactions.indptr,
+    }
+    for name, file_name in ARRAY_FILES.items():
+        np.save(staging / file_name, arrays[name], allow_pickle=False)
+
+    manifest = {
+        "format_version": FORMAT_VERSION,
+        "created_at": datetime.now().isoformat(),
+        "n_users": len(arrays["user_ids"]),
+        "n_items": len(arrays["item_ids"]),
+        "n_components": arrays["item_factors"].shape[0],
+        "nnz": int(interactions.nnz),
+        "params": params or {},
+        "files": ARRAY_FILES,
+    }
+    with open(staging / MANIFEST_FILE, "w") as f:
+        json.dump(manifest, f, indent=2)
+
+    # `directory` is a symlink to the current version. A new link replaces it
+    # in one rename, so readers always find a complete model at that path
+    link = directory.with_name(directory.name + ".link.tmp")
+    link.unlink(missing_ok=True)
+    link.symlink_to(version, target_is_directory=True)
+
+    previous = None
+    if directory.is_symlink():
+        previous = os.readlink(directory)
+    elif directory.exists():
+        # One-time migration of a plain directory to the versioned layout
+        previous = f"{directory.name}.v0"
+        os.replace(directory, directory.with_name(previous))
+    os.replace(link, directory)
+
+    # The previous version stays for readers that resolved it just before the
+    # swap; older ones (and leftovers of interrupted saves) are removed
+    for old in directory.parent.glob(f"{directory.name}.v*"):
+        if old.name not in (version, previous):
+            shutil.rmtree(old, ignore_errors=True)
+
+    return directory
+
+
+def read_manifest(directory=ARTIFACT_DIR):
+    with open(Path(directory) / MANIFEST_FILE) as f:
+        return json.load(f)
+
+
+def load_artifacts(directory=ARTIFACT_DIR, mmap_mode="r"):
+    directory = _resolve(directory)
+    manifest = read_manifest(directory)
+
+    if manifest["format_version"] != FORMAT_VERSION:
+        raise ValueError(
+            f"Unsupported artifact format {manifest['format_version']} "
+            f"in {directory}"
+        )
+
+    arrays = {
+        name: np.load(directory / file_name, mmap_mode=mmap_mode,
+                      allow_pickle=False)
+        for name, file_name in manifest["files"].items()
+    }
+
+    interactions = sparse.csr_matrix(
+        (
+            arrays.pop("interactions_data"),
+            arrays.pop("interactions_indices"),
+            arrays.pop("interactions_indptr"),
+        ),
+        shape=(manifest["n_users"], manifest["n_items"]),
+        copy=False,
+    )
+
+    return {"manifest": manifest, "interactions": interactions, **arrays}
+
+
+def load_legacy_pickle(path=LEGACY_MODEL_PATH):
+    with open(path, "rb") as f:
+        artifacts = pickle.load(f)
+
+    model = artifacts["model"]
+    interaction_matrix = artifacts["interaction_matrix"]
+
+    return {
+        "manifest": {
+            "format_version": 0,
+            "n_components": model.n_components,
+            "params": {"model": "TruncatedSVD"},
+        },
+        "user_ids": artifacts["user_encoder"].classes_,
+        "item_ids": artifacts["item_encoder"].classes_,
+        "user_factors": model.transform(interaction_matrix),
+        "item_factors": model.components_,
+        "interactions": sparse.csr_matrix(interaction_matrix.values),
+    }
+
+
+def load_model(path=ARTIFACT_DIR):
+    path = _resolve(path)
+    if path.is_dir():
+        return load_artifacts(path)
+    return load_legacy_pickle(path)
+
+
+def artifact_mtime(path=ARTIFACT_DIR):
+    path = _resolve(path)
+    if path.is_dir():
+        path = path / MANIFEST_FILE
+    return os.path.getmtime(path)
+
+
+def lookup_ids(classes, values):
+    # classes are sorted (as produced by LabelEncoder), so a binary search maps ids
+    values = np.asarray(values)
+    idx = np.searchsorted(classes, values)
+    idx = np.clip(idx, 0, max(len(classes) - 1, 0))
+    known = classes[idx] == values if len(classes) else np.zeros(len(values), bool)
+    return idx, known
+
+
+def encode_ids(classes, values):
+    idx, known = lookup_ids(classes, values)
+    if not np.all(known):
+        raise ValueError(f"Unknown ids: {np.asarray(values)[~known]}")
+    return idx
+
+
+if __name__ == "__main__":
+    artifacts = load_legacy_pickle(LEGACY_MODEL_PATH)
+    save_artifacts(
+        ARTIFACT_DIR,
+        artifacts["user_ids"],
+        artifacts["item_ids"],
+        artifacts["user_factors"],
+        artifacts["item_factors"],
+        artifacts["interactions"],
+        artifacts["manifest"]["params"],
+    )
+    print(f"Converted {LEGACY_MODEL_PATH} to {ARTIFACT_DIR}")
@@ -0,0 +1,162 @@
+import argparse
+import json
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from scipy import sparse
+
+from src.models.artifacts import ARTIFACT_DIR, save_artifacts
+from src.models.inference import Recommender
+from src.utils.memory import peak_rss_mb
+
+OUTPUT_FILE = "reports/inference_benchmark.json"
+# Fewer calls than this make p95/p99 little more than the slowest call
+MIN_CALLS = 200
+
+
+def build_synthetic_artifact(directory, n_users, n_items, n_components,
+                             density=0.01, seed=42):
+    rng = np.random.default_rng(seed)
+    interactions = sparse.random(
+        n_users, n_items, density=density, format="csr", random_state=seed,
+        data_rvs=lambda n: rng.integers(1, 4, n),
+    )
+    save_artifacts(
+        directory,
+        user_ids=np.array([f"U{i}" for i in range(n_users)]),
+        item_ids=np.arange(n_items),
+        user_factors=rng.standard_normal((n_users, n_components)),
+        item_factors=rng.standard_normal((n_components, n_items)),
+        interactions=interactions,
+        params={"model": "synthetic", "n_components": n_components},
+    )
+    return directory
+
+
+def _time_call(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def run_scenario(recommender, requests, batch_size, workers, top_k,
+                 min_calls=MIN_CALLS):
+    # Replay the requests until there are enough calls for the percentiles
+    rounds = -(-min_calls * batch_size // len(requests))
+    requests = np.tile(requests, max(rounds, 1))
+
+    if batch_size == 1:
+        calls = [
+            lambda user=user: recommender.recommend(user, top_k)
+            for user in requests
+        ]
+    else:
+        # Batched requests drain the generator so every block is actually scored
+        calls = [
+            lambda batch=requests[i:i + batch_size]: list(
+                recommender.recommend_many(batch, top_k, exclude_seen=True)
+            )
+            for i in range(0, len(requests), batch_size)
+        ]
+
+    start = time.perf_counter()
+    if workers == 1:
+        latencies = [_time_call(call) for call in calls]
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            latencies = list(pool.map(_time_call, calls))
+    elapsed = time.perf_counter() - start
+
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        "batch_size": batch_size,
+        "workers": workers,
+        "calls": len(calls),
+        "users_scored": len(requests),
+        "p50_ms": float(np.percentile(latencies_ms, 50)),
+        "p95_ms": float(np.percentile(latencies_ms, 95)),
+        "p99_ms": float(np.percentile(latencies_ms, 99)),
+        "throughput_users_per_s": len(requests) / elapsed,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def run_benchmark(model_path, n_requests=1000, batch_sizes=(1, 256),
+                  worker_counts=(1, 4), top_k=10, seed=42, min_calls=MIN_CALLS):
+    recommender = Recommender(model_path, index_path=None)
+    rng = np.random.default_rng(seed)
+    requests = rng.choice(recommender._state["user_ids"], n_requests)
+
+    # Warm up page cache, BLAS and the lazy pandas import before timing
+    recommender.recommend(requests[0], top_k)
+    list(recommender.recommend_many(requests[:max(batch_sizes)], top_k,
+                                    exclude_seen=True))
+
+    return [
+        run_scenario(recommender, requests, batch_size, workers, top_k, min_calls)
+        for batch_size in batch_sizes
+        for workers in worker_counts
+    ]
+
+
+def main(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        model_path = args.model_path
+        if args.synthetic_users:
+            model_path = build_synthetic_artifact(
+                f"{tmp}/synthetic_model",
+                args.synthetic_users,
+                args.synthetic_items,
+                args.synthetic_rank,
+            )
+
+        results = run_benchmark(
+            model_path, args.requests, args.batch_sizes, args.workers,
+            args.top_k, min_calls=args.min_calls,
+        )
+
+    report = {
+        "model_path": "synthetic" if args.synthetic_users else args.model_path,
+        "config": vars(args),
+        "results": results,
+    }
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    for row in results:
+        print(row)
+    print(f"Benchmark results written to {args.output}")
+
+    if args.mlflow:
+        import mlflow
+
+        with mlflow.start_run(run_name="inference_benchmark"):
+            mlflow.log_params({k: str(v) for k, v in vars(args).items()})
+            for row in results:
+                prefix = f"b{row['batch_size']}_w{row['workers']}"
+                mlflow.log_metrics({
+                    f"{prefix}_{name}": row[name]
+                    for name in ("p50_ms", "p95_ms", "p99_ms",
+                                 "throughput_users_per_s", "peak_rss_mb")
+                })
+            mlflow.log_artifact(args.output)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model-path", default=ARTIFACT_DIR)
+    parser.add_argument("--synthetic-users", type=int, default=0)
+    parser.add_argument("--synthetic-items", type=int, default=10_000)
+    parser.add_argument("--synthetic-rank", type=int, default=64)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 256])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--min-calls", type=int, default=MIN_CALLS)
+    parser.add_argument("--output", default=OUTPUT_FILE)
+    parser.add_argument("--mlflow", action="store_true")
+
+    main(parser.parse_args())
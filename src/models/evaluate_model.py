@@ -1,65 +1,104 @@
-import pickle
 import numpy as np
-import pandas as pd
-import mlflow
-from sqlalchemy import create_engine
-from sklearn.metrics import precision_score, recall_score
+from scipy import sparse
 
-from src.utils.config_loader import load_db_config
+from src.models.artifacts import ARTIFACT_DIR, load_model
+from src.models.inference import top_k_indices
+from src.models.train_model import fit_factors, model_params
 
-MODEL_PATH = "src/models/svd_model.pkl"
+KS = (5, 10, 20)
+BLOCK_SIZE = 1024
 
-db = load_db_config()["postgres"]
-DB_URL = (
-    f"postgresql://{db['user']}:{db['password']}"
-    f"@{db['host']}:{db['port']}/{db['database']}"
-)
-engine = create_engine(DB_URL)
 
+def holdout_split(interactions, seed=42):
+    interactions = sparse.csr_matrix(interactions, copy=True)
+    interactions.eliminate_zeros()
 
-def precision_recall_at_k(true_items, pred_items, k=5):
-    pred_items = pred_items[:k]
-    true_set = set(true_items)
-    pred_set = set(pred_items)
+    # Hold out one random item for every user with at least two interactions
+    row_nnz = np.diff(interactions.indptr)
+    users = np.flatnonzero(row_nnz > 1)
+    rng = np.random.default_rng(seed)
+    held_out = interactions.indptr[users] + (
+        rng.random(len(users)) * row_nnz[users]
+    ).astype(np.int64)
 
-    tp = len(true_set & pred_set)
-    precision = tp / k if k else 0
-    recall = tp / len(true_set) if true_set else 0
-    return precision, recall
+    test_mask = np.zeros(interactions.nnz, dtype=bool)
+    test_mask[held_out] = True
 
+    def _subset(mask):
+        data = np.where(mask, interactions.data, 0)
+        matrix = sparse.csr_matrix(
+            (data, interactions.indices.copy(), interactions.indptr.copy()),
+            shape=interactions.shape,
+        )
+        matrix.eliminate_zeros()
+        return matrix
 
-def main():
-    with open(MODEL_PATH, "rb") as f:
-        artifacts = pickle.load(f)
+    return _subset(~test_mask), _subset(test_mask)
+
+
+def evaluate(user_factors, item_factors, train, test, ks=KS,
+             block_size=BLOCK_SIZE):
+    max_k = min(max(ks), test.shape[1])
+    discounts = 1.0 / np.log2(np.arange(2, max_k + 2))
+    ideal = np.cumsum(discounts)
+
+    users = np.flatnonzero(np.diff(test.indptr))
+    totals = {f"{name}_at_{k}": 0.0 for k in ks
+              for name in ("precision", "recall", "ndcg", "map", "hit_rate")}
+
+    for start in range(0, len(users), block_size):
+        block = users[start:start + block_size]
+        scores = np.asarray(user_factors[block]) @ np.asarray(item_factors)
 
-    svd = artifacts["model"]
-    interaction_matrix = artifacts["interaction_matrix"]
+        # Items seen in training are never recommended, so they cannot be hits
+        rows, cols = train[block].nonzero()
+        scores[rows, cols] = -np.inf
 
-    scores = svd.transform(interaction_matrix) @ svd.components_
+        top_items = top_k_indices(scores, max_k)
+        relevant = test[block].toarray() > 0
+        hits = np.take_along_axis(relevant, top_items, axis=1)
+        n_relevant = relevant.sum(axis=1)
 
-    test_items = {}
-    for user in interaction_matrix.index:
-        items = interaction_matrix.loc[user][interaction_matrix.loc[user] > 0]
-        if len(items) > 1:
-            test_items[user] = [items.index[-1]]
+        cum_hits = np.cumsum(hits, axis=1)
+        precision_at_rank = cum_hits / np.arange(1, max_k + 1)
 
-    precisions, recalls = [], []
+        for k in ks:
+            kk = min(k, max_k)
+            hits_k = cum_hits[:, kk - 1]
+            n_ideal = np.minimum(n_relevant, kk)
+
+            totals[f"precision_at_{k}"] += (hits_k / k).sum()
+            totals[f"recall_at_{k}"] += (hits_k / n_relevant).sum()
+            totals[f"hit_rate_at_{k}"] += (hits_k > 0).sum()
+            totals[f"ndcg_at_{k}"] += (
+                (hits[:, :kk] * discounts[:kk]).sum(axis=1)
+                / ideal[n_ideal - 1]
+            ).sum()
+            totals[f"map_at_{k}"] += (
+                (precision_at_rank[:, :kk] * hits[:, :kk]).sum(axis=1) / n_ideal
+            ).sum()
+
+    n_users = max(len(users), 1)
+    return {name: float(total / n_users) for name, total in totals.items()}
+
+
+def main():
+    import mlflow
 
-    for user, true_items in test_items.items():
-        ranked_items = np.argsort(scores[user])[::-1]
-        p, r = precision_recall_at_k(true_items, ranked_items)
-        precisions.append(p)
-        recalls.append(r)
+    artifacts = load_model(ARTIFACT_DIR)
+    params = model_params(artifacts["manifest"]["params"])
 
-    precision_at_5 = np.mean(precisions)
-    recall_at_5 = np.mean(recalls)
+    # Refit on the training split only, so every test item is unseen by the model
+    train, test = holdout_split(artifacts["interactions"])
+    user_factors, item_factors = fit_factors(train, **params)
+    metrics = evaluate(user_factors, item_factors, train, test)
 
     with mlflow.start_run():
-        mlflow.log_metric("precision_at_5", precision_at_5)
-        mlflow.log_metric("recall_at_5", recall_at_5)
+        mlflow.log_params(params)
+        mlflow.log_metrics(metrics)
 
-    print(f"Precision@5: {precision_at_5:.4f}")
-    print(f"Recall@5: {recall_at_5:.4f}")
+    for name, value in metrics.items():
+        print(f"{name}: {value:.4f}")
 
 
 if __name__ == "__main__":
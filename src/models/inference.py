@@ -1,23 +1,181 @@
-import pickle
+import os
+import threading
+import warnings
 import numpy as np
 
-MODEL_PATH = "src/models/svd_model.pkl"
+from src.models.ann_index import ANN_INDEX_PATH, IVFIndex
+from src.models.artifacts import ARTIFACT_DIR, artifact_mtime, encode_ids, load_model
 
+MODEL_PATH = ARTIFACT_DIR
+BLOCK_SIZE = 1024
 
-def recommend(user_id, top_k=5):
-    with open(MODEL_PATH, "rb") as f:
-        artifacts = pickle.load(f)
 
-    model = artifacts["model"]
-    user_enc = artifacts["user_encoder"]
-    item_enc = artifacts["item_encoder"]
-    interaction_matrix = artifacts["interaction_matrix"]
+def top_k_indices(scores, k):
+    # argpartition picks the k best in linear time, then only those k get sorted
+    k = min(k, scores.shape[-1])
+    part = np.argpartition(-scores, k - 1, axis=-1)[..., :k]
+    order = np.argsort(-np.take_along_axis(scores, part, axis=-1), axis=-1)
+    return np.take_along_axis(part, order, axis=-1)
 
-    user_idx = user_enc.transform([user_id])[0]
-    scores = model.transform(interaction_matrix) @ model.components_
 
-    top_items = np.argsort(scores[user_idx])[::-1][:top_k]
-    return item_enc.inverse_transform(top_items)
+class Recommender:
+    def __init__(self, model_path=MODEL_PATH, index_path=ANN_INDEX_PATH):
+        self.model_path = model_path
+        self.index_path = index_path
+        self._lock = threading.Lock()
+        self._state = None
+        self._mtime = None
+        self.reload()
+
+    def reload(self):
+        mtime = artifact_mtime(self.model_path)
+        artifacts = load_model(self.model_path)
+
+        index = None
+        if self.index_path and os.path.exists(self.index_path):
+            index = IVFIndex.load(self.index_path)
+            # An index left over from another model would map to the wrong
+            # items; recommend() then warns and scores exactly
+            if not index.matches(artifacts["manifest"]):
+                index = None
+
+        # Factors stay memory-mapped, so worker processes share the same pages
+        state = {
+            "index": index,
+            "user_ids": artifacts["user_ids"],
+            "item_ids": artifacts["item_ids"],
+            "user_factors": artifacts["user_factors"],
+            "item_factors": artifacts["item_factors"],
+            "seen": artifacts["interactions"],
+        }
+
+        # Swap the whole state at once so in-flight requests see a consistent model
+        with self._lock:
+            self._state = state
+            self._mtime = mtime
+
+    def reload_if_changed(self):
+        if artifact_mtime(self.model_path) != self._mtime:
+            self.reload()
+            return True
+        return False
+
+    def recommend(self, user_id, top_k=5, n_probe=None):
+        state = self._state
+
+        user_idx = encode_ids(state["user_ids"], [user_id])[0]
+
+        if n_probe is not None and state["index"] is None:
+            warnings.warn(
+                f"n_probe={n_probe} requested but no ANN index matching the "
+                f"model was loaded from {self.index_path}; using exact scoring. "
+                f"Retrain the model to build the index",
+                RuntimeWarning,
+                stacklevel=2,
+            )
+
+        # n_probe trades recall for latency; None keeps exact scoring
+        if n_probe is not None and state["index"] is not None:
+            top_items, _ = state["index"].search(
+                state["user_factors"][user_idx].astype(np.float32),
+                top_k,
+                n_probe,
+            )
+        else:
+            scores = state["user_factors"][user_idx] @ state["item_factors"]
+            top_items = top_k_indices(scores, top_k)
+
+        return state["item_ids"][top_items]
+
+    def recommend_many(self, user_ids, top_k=5, exclude_seen=False,
+                       block_size=BLOCK_SIZE):
+        import pandas as pd
+
+        state = self._state
+        user_idx = encode_ids(state["user_ids"], user_ids)
+
+        for start in range(0, len(user_idx), block_size):
+            block = user_idx[start:start + block_size]
+            scores = state["user_factors"][block] @ state["item_factors"]
+
+            if exclude_seen:
+                rows, cols = state["seen"][block].nonzero()
+                scores[rows, cols] = -np.inf
+
+            top_items = top_k_indices(scores, top_k)
+            top_scores = np.take_along_axis(scores, top_items, axis=1)
+
+            # Users with fewer than top_k unseen items get fewer rows, not
+            # seen items padded in with a -inf score
+            keep = np.isfinite(top_scores).ravel()
+
+            yield pd.DataFrame({
+                "user_id": state["user_ids"][block].repeat(
+                    top_items.shape[1]
+                )[keep],
+                "rank": np.tile(
+                    np.arange(1, top_items.shape[1] + 1), len(block)
+                )[keep],
+                "product_id": state["item_ids"][top_items.ravel()[keep]],
+                "score": top_scores.ravel()[keep],
+            })
+
+    def export_recommendations(self, output_path, user_ids=None, top_k=5,
+                               exclude_seen=True, block_size=BLOCK_SIZE):
+        if user_ids is None:
+            user_ids = self._state["user_ids"]
+
+        blocks = self.recommend_many(user_ids, top_k, exclude_seen, block_size)
+        output_path = str(output_path)
+        rows = 0
+
+        if output_path.endswith(".parquet"):
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            writer = None
+            try:
+                for df in blocks:
+                    table = pa.Table.from_pandas(df, preserve_index=False)
+                    if writer is None:
+                        writer = pq.ParquetWriter(output_path, table.schema)
+                    writer.write_table(table)
+                    rows += len(df)
+            finally:
+                if writer is not None:
+                    writer.close()
+        else:
+            header = True
+            for df in blocks:
+                df.to_csv(output_path, mode="w" if header else "a",
+                          header=header, index=False)
+                header = False
+                rows += len(df)
+
+        return rows
+
+
+_recommender = None
+_recommender_lock = threading.Lock()
+
+
+def get_recommender(model_path=MODEL_PATH):
+    global _recommender
+
+    with _recommender_lock:
+        if _recommender is None or _recommender.model_path != model_path:
+            _recommender = Recommender(model_path)
+        return _recommender
+
+
+def recommend(user_id, top_k=5, n_probe=None):
+    return get_recommender().recommend(user_id, top_k, n_probe)
+
+
+def recommend_many(user_ids, top_k=5, exclude_seen=False, block_size=BLOCK_SIZE):
+    return get_recommender().recommend_many(
+        user_ids, top_k, exclude_seen, block_size
+    )
 
 
 if __name__ == "__main__":
@@ -0,0 +1,122 @@
+import argparse
+import itertools
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+from scipy import sparse
+
+from src.models.ann_index import ANN_INDEX_PATH, IVFIndex
+from src.models.artifacts import ARTIFACT_DIR, read_manifest, save_artifacts
+from src.models.evaluate_model import evaluate, holdout_split
+from src.models.train_model import build_sparse_matrix, fit_factors
+
+RANKS = [5, 10, 20, 50]
+ALGORITHMS = ["randomized", "arpack", "als"]
+SELECTION_METRIC = "ndcg_at_10"
+
+_shared = {}
+
+
+def _share_matrices(matrices, directory):
+    for key, matrix in matrices.items():
+        for name in ("data", "indices", "indptr"):
+            np.save(os.path.join(directory, f"{key}_{name}.npy"),
+                    getattr(matrix, name))
+
+
+def _attach_matrices(directory, keys, shape):
+    # Every worker maps the same files, so the matrices are held in memory once
+    for key in keys:
+        arrays = [
+            np.load(os.path.join(directory, f"{key}_{name}.npy"), mmap_mode="r")
+            for name in ("data", "indices", "indptr")
+        ]
+        _shared[key] = sparse.csr_matrix(tuple(arrays), shape=shape, copy=False)
+
+
+def fit_candidate(params):
+    train, test = _shared["train"], _shared["test"]
+
+    user_factors, item_factors = fit_factors(train, **params)
+    metrics = evaluate(user_factors, item_factors, train, test)
+
+    return {"params": params, "metrics": metrics}
+
+
+def sweep(ranks=RANKS, algorithms=ALGORITHMS, max_workers=None,
+          selection_metric=SELECTION_METRIC):
+    import mlflow
+
+    user_ids, item_ids, matrix = build_sparse_matrix()
+
+    # arpack needs strictly fewer components than the smaller matrix dimension
+    grid = [
+        {"model": "ALS", "n_components": rank} if algorithm == "als"
+        else {"model": "TruncatedSVD", "algorithm": algorithm, "n_components": rank}
+        for algorithm, rank in itertools.product(algorithms, ranks)
+        if rank < min(matrix.shape)
+    ]
+    train, test = holdout_split(matrix)
+
+    best = None
+    with tempfile.TemporaryDirectory() as shared_dir, \
+            mlflow.start_run(run_name="svd_sweep"):
+        _share_matrices({"train": train, "test": test}, shared_dir)
+        mlflow.log_param("grid_size", len(grid))
+
+        with ProcessPoolExecutor(
+            max_workers=max_workers,
+            initializer=_attach_matrices,
+            initargs=(shared_dir, ("train", "test"), matrix.shape),
+        ) as pool:
+            futures = [pool.submit(fit_candidate, params) for params in grid]
+
+            for future in as_completed(futures):
+                result = future.result()
+
+                with mlflow.start_run(nested=True):
+                    mlflow.log_params(result["params"])
+                    mlflow.log_metrics(result["metrics"])
+
+                print(result["params"], result["metrics"])
+
+                score = result["metrics"][selection_metric]
+                if best is None or score > best["metrics"][selection_metric]:
+                    best = result
+
+        mlflow.log_params({f"best_{k}": v for k, v in best["params"].items()})
+        mlflow.log_metric(f"best_{selection_metric}",
+                          best["metrics"][selection_metric])
+
+        # Candidates were scored on the training split; refit the winner on all data
+        user_factors, item_factors = fit_factors(matrix, **best["params"])
+
+        save_artifacts(
+            ARTIFACT_DIR,
+            user_ids=user_ids,
+            item_ids=item_ids,
+            user_factors=user_factors,
+            item_factors=item_factors,
+            interactions=matrix,
+            params=best["params"],
+        )
+        mlflow.log_artifacts(ARTIFACT_DIR, artifact_path="svd_model")
+
+        index = IVFIndex.build(item_factors.T)
+        index.save(ANN_INDEX_PATH, read_manifest(ARTIFACT_DIR))
+        mlflow.log_artifact(ANN_INDEX_PATH)
+
+    return best
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--ranks", type=int, nargs="+", default=RANKS)
+    parser.add_argument("--algorithms", nargs="+", default=ALGORITHMS)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    best = sweep(args.ranks, args.algorithms, args.workers)
+    print(f"Best model: {best['params']} {best['metrics']}")
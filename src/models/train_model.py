@@ -1,24 +1,24 @@
-import pickle
+import argparse
+import numpy as np
 import pandas as pd
-import mlflow
-from sklearn.decomposition import TruncatedSVD
-from sklearn.preprocessing import LabelEncoder
-from sqlalchemy import create_engine
+from scipy import sparse
 
-from src.utils.config_loader import load_db_config
+from src.models.als import fit_als
+from src.models.ann_index import ANN_INDEX_PATH, IVFIndex
+from src.models.artifacts import ARTIFACT_DIR, read_manifest, save_artifacts
+from src.utils.db import get_engine
+from src.utils.memory import peak_rss_mb
 
-MODEL_PATH = "src/models/svd_model.pkl"
-
-db = load_db_config()["postgres"]
-DB_URL = (
-    f"postgresql://{db['user']}:{db['password']}"
-    f"@{db['host']}:{db['port']}/{db['database']}"
+CHUNK_SIZE = 100_000
+MODEL_PARAMS = (
+    "model", "n_components", "algorithm", "regularization", "alpha", "iterations"
 )
-engine = create_engine(DB_URL)
 
 
-def main():
-    df = pd.read_sql("SELECT * FROM user_item_features", engine)
+def build_dense_matrix():
+    from sklearn.preprocessing import LabelEncoder
+
+    df = pd.read_sql("SELECT * FROM user_item_features", get_engine())
 
     user_enc = LabelEncoder()
     item_enc = LabelEncoder()
@@ -33,29 +33,119 @@ def main():
         fill_value=0
     )
 
-    svd = TruncatedSVD(n_components=10, random_state=42)
+    return user_enc.classes_, item_enc.classes_, interaction_matrix
+
+
+def build_sparse_matrix(chunksize=CHUNK_SIZE):
+    users, items, scores = [], [], []
+
+    # stream_results keeps a server-side cursor open, so only one chunk is in flight
+    with get_engine().connect().execution_options(stream_results=True) as conn:
+        for chunk in pd.read_sql(
+            "SELECT user_id, product_id, total_interaction_score "
+            "FROM user_item_features",
+            conn,
+            chunksize=chunksize,
+        ):
+            users.append(chunk["user_id"].to_numpy())
+            items.append(chunk["product_id"].to_numpy())
+            scores.append(
+                chunk["total_interaction_score"].to_numpy(dtype=np.float32)
+            )
+
+    # np.unique sorts like LabelEncoder, so ids map to the same indices
+    user_ids, user_idx = np.unique(np.concatenate(users), return_inverse=True)
+    item_ids, item_idx = np.unique(np.concatenate(items), return_inverse=True)
+
+    interaction_matrix = sparse.coo_matrix(
+        (np.concatenate(scores), (user_idx, item_idx)),
+        shape=(len(user_ids), len(item_ids)),
+    ).tocsr()
+
+    return user_ids, item_ids, interaction_matrix
+
+
+def model_params(params):
+    return {k: v for k, v in params.items() if k in MODEL_PARAMS}
+
+
+def fit_factors(matrix, model="TruncatedSVD", n_components=10,
+                algorithm="randomized", regularization=0.1, alpha=40.0,
+                iterations=15):
+    if model == "ALS":
+        return fit_als(
+            matrix,
+            n_components=n_components,
+            regularization=regularization,
+            alpha=alpha,
+            iterations=iterations,
+        )
+
+    from sklearn.decomposition import TruncatedSVD
+
+    svd = TruncatedSVD(
+        n_components=n_components, algorithm=algorithm, random_state=42
+    )
+    user_factors = svd.fit_transform(matrix)
+    return user_factors, svd.components_
+
+
+def main(mode="sparse", params=None):
+    import mlflow
+
+    if mode == "sparse":
+        user_ids, item_ids, interaction_matrix = build_sparse_matrix()
+        interactions = interaction_matrix
+    else:
+        user_ids, item_ids, interaction_matrix = build_dense_matrix()
+        interactions = sparse.csr_matrix(interaction_matrix.values)
+
+    params = params or {"model": "TruncatedSVD", "n_components": 10}
 
     with mlflow.start_run():
-        mlflow.log_param("model", "TruncatedSVD")
-        mlflow.log_param("n_components", 10)
+        mlflow.log_params(params)
         mlflow.log_param("training_source", "postgres:user_item_features")
+        mlflow.log_param("training_mode", mode)
 
-        user_factors = svd.fit_transform(interaction_matrix)
-
-        with open(MODEL_PATH, "wb") as f:
-            pickle.dump(
-                {
-                    "model": svd,
-                    "user_encoder": user_enc,
-                    "item_encoder": item_enc,
-                    "interaction_matrix": interaction_matrix
-                },
-                f
-            )
+        user_factors, item_factors = fit_factors(interaction_matrix, **params)
+
+        save_artifacts(
+            ARTIFACT_DIR,
+            user_ids=user_ids,
+            item_ids=item_ids,
+            user_factors=user_factors,
+            item_factors=item_factors,
+            interactions=interactions,
+            params={**params, "training_mode": mode},
+        )
+        mlflow.log_artifacts(ARTIFACT_DIR, artifact_path="svd_model")
 
-        mlflow.log_artifact(MODEL_PATH)
+        index = IVFIndex.build(item_factors.T)
+        index.save(ANN_INDEX_PATH, read_manifest(ARTIFACT_DIR))
+        mlflow.log_param("ann_n_lists", index.n_lists)
+        mlflow.log_artifact(ANN_INDEX_PATH)
+
+        mlflow.log_metric("peak_memory_mb", peak_rss_mb())
         print("Model trained and saved successfully")
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--mode", choices=["sparse", "dense"], default="sparse")
+    parser.add_argument("--model", choices=["TruncatedSVD", "ALS"],
+                        default="TruncatedSVD")
+    parser.add_argument("--n-components", type=int, default=10)
+    parser.add_argument("--regularization", type=float, default=0.1)
+    parser.add_argument("--alpha", type=float, default=40.0)
+    parser.add_argument("--iterations", type=int, default=15)
+    args = parser.parse_args()
+
+    params = {"model": args.model, "n_components": args.n_components}
+    if args.model == "ALS":
+        params.update({
+            "regularization": args.regularization,
+            "alpha": args.alpha,
+            "iterations": args.iterations,
+        })
+
+    main(mode=args.mode, params=params)
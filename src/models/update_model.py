@@ -0,0 +1,170 @@
+import argparse
+import os
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from sqlalchemy import bindparam, text
+
+from src.models.als import fold_in_als
+from src.models.ann_index import ANN_INDEX_PATH, IVFIndex
+from src.models.artifacts import (
+    ARTIFACT_DIR, load_artifacts, lookup_ids, read_manifest, save_artifacts,
+)
+from src.models.train_model import CHUNK_SIZE, main as full_retrain, model_params
+from src.utils.db import get_engine
+
+DRIFT_THRESHOLD = 0.2
+
+
+def read_interactions(user_ids=None, chunksize=CHUNK_SIZE):
+    query = (
+        "SELECT user_id, product_id, total_interaction_score "
+        "FROM user_item_features"
+    )
+    params = {}
+    if user_ids is not None:
+        query = text(query + " WHERE user_id IN :user_ids").bindparams(
+            bindparam("user_ids", expanding=True)
+        )
+        params = {"user_ids": list(user_ids)}
+    else:
+        query = text(query)
+
+    with get_engine().connect().execution_options(stream_results=True) as conn:
+        chunks = list(pd.read_sql(query, conn, params=params, chunksize=chunksize))
+
+    if not chunks:
+        return pd.DataFrame(
+            columns=["user_id", "product_id", "total_interaction_score"]
+        )
+    return pd.concat(chunks, ignore_index=True)
+
+
+def fold_in(artifacts, delta):
+    old_user_ids = artifacts["user_ids"]
+    item_ids = artifacts["item_ids"]
+    item_factors = np.asarray(artifacts["item_factors"])
+    interactions = artifacts["interactions"]
+
+    item_idx, item_known = lookup_ids(item_ids, delta["product_id"].to_numpy())
+    unknown_item_nnz = int((~item_known).sum())
+
+    delta_users, delta_rows = np.unique(
+        delta["user_id"].to_numpy(), return_inverse=True
+    )
+    new_rows = sparse.csr_matrix(
+        (
+            delta["total_interaction_score"].to_numpy(dtype=np.float32)[item_known],
+            (delta_rows[item_known], item_idx[item_known]),
+        ),
+        shape=(len(delta_users), len(item_ids)),
+    )
+
+    # Only users whose row actually differs from the stored one are refreshed
+    old_idx, user_known = lookup_ids(old_user_ids, delta_users)
+    old_rows = sparse.diags(user_known.astype(np.float32)) @ interactions[old_idx]
+    changed = np.asarray(abs(new_rows - old_rows).sum(axis=1)).ravel() > 0
+
+    changed_users = delta_users[changed]
+    changed_rows = new_rows[changed]
+
+    # Folding in keeps item factors fixed: for SVD that is TruncatedSVD.transform,
+    # for ALS it is one least-squares user step
+    params = artifacts["manifest"]["params"]
+    if params.get("model") == "ALS":
+        changed_factors = fold_in_als(
+            changed_rows,
+            item_factors,
+            regularization=params.get("regularization", 0.1),
+            alpha=params.get("alpha", 40.0),
+        )
+    else:
+        changed_factors = changed_rows @ item_factors.T
+
+    # Merge into a sorted id space so ids can still be looked up by binary search
+    user_ids = np.union1d(old_user_ids, changed_users)
+    old_pos = np.searchsorted(user_ids, old_user_ids)
+    changed_pos = np.searchsorted(user_ids, changed_users)
+
+    user_factors = np.zeros((len(user_ids), item_factors.shape[0]), np.float32)
+    user_factors[old_pos] = artifacts["user_factors"]
+    user_factors[changed_pos] = changed_factors
+
+    old_coo = interactions.tocoo()
+    keep = ~np.isin(old_coo.row, old_idx[changed & user_known])
+    changed_coo = changed_rows.tocoo()
+
+    merged = sparse.coo_matrix(
+        (
+            np.concatenate([old_coo.data[keep], changed_coo.data]),
+            (
+                np.concatenate([old_pos[old_coo.row[keep]],
+                                changed_pos[changed_coo.row]]),
+                np.concatenate([old_coo.col[keep], changed_coo.col]),
+            ),
+        ),
+        shape=(len(user_ids), len(item_ids)),
+    ).tocsr()
+
+    stats = {
+        "new_users": int((changed & ~user_known).sum()),
+        "updated_users": int((changed & user_known).sum()),
+        "folded_nnz": int(changed_rows.nnz),
+        "unknown_item_nnz": unknown_item_nnz,
+    }
+    return user_ids, user_factors, merged, stats
+
+
+def update(user_ids=None, drift_threshold=DRIFT_THRESHOLD,
+           artifact_dir=ARTIFACT_DIR):
+    artifacts = load_artifacts(artifact_dir)
+    params = dict(artifacts["manifest"]["params"])
+
+    delta = read_interactions(user_ids)
+    new_user_ids, user_factors, interactions, stats = fold_in(artifacts, delta)
+
+    # Drift: interactions the frozen components have absorbed (or could not,
+    # because the item is new) since the last full fit, relative to its size
+    base_nnz = params.get("base_nnz", artifacts["manifest"]["nnz"])
+    folded_nnz = params.get("folded_nnz", 0) + stats["folded_nnz"]
+    drift = (folded_nnz + stats["unknown_item_nnz"]) / max(base_nnz, 1)
+    stats["drift"] = drift
+
+    if drift > drift_threshold:
+        print(f"Drift {drift:.3f} exceeds {drift_threshold}, running full retrain")
+        # Retrain the same model the artifacts were built with
+        full_retrain(
+            mode=params.get("training_mode", "sparse"), params=model_params(params)
+        )
+        stats["retrained"] = True
+        return stats
+
+    params.update({"base_nnz": base_nnz, "folded_nnz": folded_nnz})
+    index = None
+    if os.path.exists(ANN_INDEX_PATH):
+        index = IVFIndex.load(ANN_INDEX_PATH)
+    save_artifacts(
+        artifact_dir,
+        user_ids=new_user_ids,
+        item_ids=artifacts["item_ids"],
+        user_factors=user_factors,
+        item_factors=artifacts["item_factors"],
+        interactions=interactions,
+        params=params,
+    )
+    # Folding in leaves the item factors unchanged, so an index built for the
+    # previous artifact is re-stamped for the new one
+    if index is not None and index.matches(artifacts["manifest"]):
+        index.save(ANN_INDEX_PATH, read_manifest(artifact_dir))
+
+    stats["retrained"] = False
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", nargs="*", default=None)
+    parser.add_argument("--drift-threshold", type=float, default=DRIFT_THRESHOLD)
+    args = parser.parse_args()
+
+    print(update(args.users, args.drift_threshold))
@@ -64,7 +64,7 @@ def validate_data():
 def prepare_data():
     logger = get_run_logger()
     subprocess.run(
-        [sys.executable, "-m", "src.preparation.clean_and_prepare"],
+        [sys.executable, "-m", "src.preparation.clean_and_prepare", "--eda"],
         check=True
     )
     logger.info("Data preparation completed")
@@ -80,6 +80,16 @@ def feature_engineering():
     logger.info("Feature engineering completed")
 
 
+@task
+def windowed_features():
+    logger = get_run_logger()
+    subprocess.run(
+        [sys.executable, "-m", "src.transformation.windowed_features"],
+        check=True
+    )
+    logger.info("Windowed feature update completed")
+
+
 @task
 def feature_store_demo():
     logger = get_run_logger()
@@ -117,6 +127,7 @@ def recommendation_pipeline():
     validate_data()
     prepare_data()
     feature_engineering()
+    windowed_features()
     feature_store_demo()
     train_model()
     evaluate_model()
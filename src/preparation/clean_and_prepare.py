@@ -1,10 +1,12 @@
-import json
-import pandas as pd
-import matplotlib.pyplot as plt
+import argparse
+from datetime import datetime
 from pathlib import Path
-from sklearn.preprocessing import MinMaxScaler, LabelEncoder
+
+import pandas as pd
 
 from src.utils.config_loader import load_paths
+from src.utils.json_store import read_json, write_json
+from src.utils import raw_reader
 
 paths = load_paths()
 
@@ -14,51 +16,142 @@ PROCESSED_PATH.mkdir(parents=True, exist_ok=True)
 EDA_PATH = PROCESSED_PATH / "eda"
 EDA_PATH.mkdir(parents=True, exist_ok=True)
 
+OUTPUT_FILE = PROCESSED_PATH / "prepared_interactions.csv"
+DELTA_FILE = PROCESSED_PATH / "prepared_interactions_delta.csv"
+MANIFEST_FILE = PROCESSED_PATH / "preparation_manifest.json"
+
+
+def load_clickstream(start_date=None, end_date=None):
+    return raw_reader.load_clickstream(start_date, end_date)
+
+
+def load_products(start_date=None, end_date=None):
+    return raw_reader.load_products(start_date, end_date)
+
+
+def fit_encoding(df):
+    # Same parameters LabelEncoder and MinMaxScaler would learn
+    return {
+        "category_classes": sorted(df["category"].dropna().unique().tolist()),
+        "price_min": float(df["price"].min()),
+        "price_max": float(df["price"].max()),
+    }
 
-def load_clickstream():
-    files = RAW_PATH.glob("clickstream/*/*/*/clickstream.csv")
-    return pd.concat([pd.read_csv(f) for f in files], ignore_index=True)
 
+def extend_encoding(encoding, df):
+    # Unseen categories get new codes; existing codes never change
+    known = set(encoding["category_classes"])
+    unseen = sorted(set(df["category"].dropna()) - known)
+    return {
+        **encoding,
+        "category_classes": encoding["category_classes"] + unseen,
+    }
 
-def load_products():
-    files = RAW_PATH.glob("products/*/*/*/products.json")
-    products = []
-    for f in files:
-        with open(f) as file:
-            products.extend(json.load(file))
-    return pd.json_normalize(products)
 
+def apply_encoding(df, encoding):
+    df["category_encoded"] = pd.Categorical(
+        df["category"], categories=encoding["category_classes"]
+    ).codes
+
+    # Prices outside the fitted range scale outside [0, 1], as with MinMaxScaler
+    price_range = encoding["price_max"] - encoding["price_min"]
+    df["price_normalized"] = (df["price"] - encoding["price_min"]) / (
+        price_range if price_range else 1.0
+    )
+    return df
+
+
+def load_manifest():
+    return read_json(MANIFEST_FILE)
 
-def prepare_data():
-    clicks = load_clickstream()
-    products = load_products()
 
+def save_manifest(manifest):
+    write_json(MANIFEST_FILE, manifest)
+
+
+def prepare_clicks(clicks, products, encoding=None):
     # Basic cleaning
-    clicks.dropna(subset=["user_id", "product_id"], inplace=True)
+    clicks = clicks.dropna(subset=["user_id", "product_id"])
 
     # Event encoding
     event_map = {"view": 1, "click": 2, "add_to_cart": 3}
-    clicks["event_score"] = clicks["event_type"].map(event_map)
+    # Mapping a categorical keeps it categorical, so cast back to numbers
+    clicks["event_score"] = clicks["event_type"].map(event_map).astype("Int64")
 
     # Merge
     df = clicks.merge(products, left_on="product_id", right_on="id", how="inner")
 
-    # Encode category
-    le = LabelEncoder()
-    df["category_encoded"] = le.fit_transform(df["category"])
-
-    # Normalize price
-    scaler = MinMaxScaler()
-    df["price_normalized"] = scaler.fit_transform(df[["price"]])
+    # Encode category and normalize price
+    encoding = fit_encoding(df) if encoding is None else extend_encoding(encoding, df)
+    df = apply_encoding(df, encoding)
 
     # Timestamp features
     df["timestamp"] = pd.to_datetime(df["timestamp"])
     df["hour"] = df["timestamp"].dt.hour
 
-    return df
+    return df, encoding
+
+
+def read_new_clicks(consumed):
+    frames, partitions = [], {}
+
+    # Per partition, the file size and rows consumed so far: unchanged days
+    # are never opened and appended days are read from where the last run
+    # stopped, so a run costs the new rows rather than the whole history
+    for day, path in raw_reader.clickstream_partitions():
+        state, chunks = raw_reader.clickstream_delta(
+            path, consumed.get(day.isoformat())
+        )
+        for chunk in chunks:
+            frames.append(chunk)
+            state["rows"] += len(chunk)
+        partitions[day.isoformat()] = state
+
+    return frames, partitions
+
+
+def prepare_data(full_rebuild=False):
+    manifest = None if full_rebuild else load_manifest()
+
+    frames, partitions = read_new_clicks(manifest["partitions"] if manifest else {})
+    if not frames:
+        return None, manifest
+
+    clicks = pd.concat(frames, ignore_index=True)
+    # One row per product, taken from the most recent snapshot
+    products = load_products().drop_duplicates("id", keep="last")
+
+    df, encoding = prepare_clicks(
+        clicks, products, manifest["encoding"] if manifest else None
+    )
+    if manifest:
+        # Keep the column order of the file being appended to
+        df = df.reindex(columns=manifest["columns"])
+
+    manifest = {
+        "partitions": partitions,
+        "watermark": max(partitions),
+        "encoding": encoding,
+        "columns": list(df.columns),
+        "updated_at": datetime.now().isoformat(),
+    }
+    return df, manifest
+
+
+def write_prepared(df, manifest, full_rebuild=False):
+    append = not full_rebuild and OUTPUT_FILE.exists()
+    df.to_csv(OUTPUT_FILE, mode="a" if append else "w", header=not append, index=False)
+
+    # The latest batch on its own, for incremental feature updates
+    df.to_csv(DELTA_FILE, index=False)
+
+    # Recorded last, so an interrupted run is retried rather than skipped
+    save_manifest(manifest)
 
 
 def run_eda(df):
+    import matplotlib.pyplot as plt
+
     # Interaction distribution
     plt.figure()
     df["event_type"].value_counts().plot(kind="bar", title="Interaction Types")
@@ -92,10 +185,27 @@ def run_eda(df):
 
 
 if __name__ == "__main__":
-    final_df = prepare_data()
-    run_eda(final_df)
-
-    output_file = PROCESSED_PATH / "prepared_interactions.csv"
-    final_df.to_csv(output_file, index=False)
-
-    print(f"Prepared dataset saved at {output_file}")
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--full-rebuild", action="store_true")
+    parser.add_argument("--eda", action="store_true")
+    args = parser.parse_args()
+
+    first_run = load_manifest() is None
+    final_df, manifest = prepare_data(args.full_rebuild)
+
+    if final_df is None:
+        # The previous delta has already been handed on; leaving it in place
+        # would let an incremental feature run merge it again
+        DELTA_FILE.unlink(missing_ok=True)
+        print("No new raw rows to prepare")
+    else:
+        write_prepared(final_df, manifest, args.full_rebuild)
+        print(
+            f"Prepared {len(final_df)} rows up to {manifest['watermark']}, "
+            f"saved at {OUTPUT_FILE}"
+        )
+
+    # EDA describes the whole prepared dataset: it runs on the first run, on
+    # rebuilds and on request, not on every incremental append
+    if (first_run or args.full_rebuild or args.eda) and OUTPUT_FILE.exists():
+        run_eda(pd.read_csv(OUTPUT_FILE))
@@ -0,0 +1,254 @@
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+import numpy as np
+import pandas as pd
+
+CHUNK_SIZE = 500_000
+INPUT_COLUMNS = ["user_id", "product_id", "event_score", "rating.rate"]
+
+# Every feature is a count or a sum over one input column, so partial states
+# from chunks or workers merge by addition; means are derived at the end
+AGGREGATIONS = {
+    "user_features": {
+        "entity": "user",
+        "sums": {
+            "total_interactions": ("count", "event_score"),
+            "total_interaction_score": ("sum", "event_score"),
+        },
+    },
+    "item_features": {
+        "entity": "product",
+        "sums": {
+            "total_interactions": ("count", "event_score"),
+            "total_interaction_score": ("sum", "event_score"),
+            "rating_sum": ("sum", "rating.rate"),
+            "rating_count": ("count", "rating.rate"),
+        },
+    },
+    "user_item_features": {
+        "entity": "pair",
+        "sums": {
+            "interaction_count": ("count", "event_score"),
+            "total_interaction_score": ("sum", "event_score"),
+        },
+    },
+}
+MEANS = {
+    "user_features": {
+        "avg_interaction_score": ("total_interaction_score", "total_interactions"),
+    },
+    "item_features": {
+        "avg_interaction_score": ("total_interaction_score", "total_interactions"),
+        "avg_rating": ("rating_sum", "rating_count"),
+    },
+    "user_item_features": {},
+}
+# Same column order as the groupby-based generators
+COLUMNS = {
+    "user_features": [
+        "user_id", "total_interactions", "avg_interaction_score",
+        "total_interaction_score",
+    ],
+    "item_features": [
+        "product_id", "total_interactions", "avg_interaction_score", "avg_rating",
+        "total_interaction_score", "rating_sum", "rating_count",
+    ],
+    "user_item_features": [
+        "user_id", "product_id", "interaction_count", "total_interaction_score",
+    ],
+}
+PAIR_SHIFT = 32
+
+
+class Dictionary:
+    def __init__(self):
+        self.values = None
+
+    def __len__(self):
+        return 0 if self.values is None else len(self.values)
+
+    def encode(self, values):
+        # One hash pass over the batch; only its distinct keys touch the dictionary
+        local_codes, uniques = pd.factorize(values, use_na_sentinel=False)
+        if self.values is None:
+            # The first batch fixes the key dtype
+            self.values = pd.Index(uniques)
+            return local_codes
+
+        mapping = self.values.get_indexer(uniques)
+        new = mapping < 0
+        if new.any():
+            # Codes are append-only, so earlier codes stay valid
+            mapping[new] = np.arange(len(self.values), len(self.values) + new.sum())
+            self.values = self.values.append(pd.Index(uniques[new]))
+        return mapping[local_codes]
+
+    def order(self):
+        return np.argsort(self.values.to_numpy(), kind="stable")
+
+    def ranks(self):
+        ranks = np.empty(len(self), dtype=np.int64)
+        ranks[self.order()] = np.arange(len(self))
+        return ranks
+
+
+class FeatureAggregator:
+    def __init__(self, groups=None):
+        # Only the requested groups are accumulated; pairs are encoded only if
+        # user_item_features is one of them
+        self.groups = tuple(AGGREGATIONS if groups is None else groups)
+        self.pairs = any(AGGREGATIONS[g]["entity"] == "pair" for g in self.groups)
+        self.entities = {
+            "user": Dictionary(), "product": Dictionary(), "pair": Dictionary()
+        }
+        self.sums = {
+            group: {column: np.zeros(0) for column in AGGREGATIONS[group]["sums"]}
+            for group in self.groups
+        }
+        self.integer_scores = True
+
+    def _accumulate(self, codes_by_entity, columns):
+        for group in self.groups:
+            spec = AGGREGATIONS[group]
+            codes = codes_by_entity[spec["entity"]]
+            size = len(self.entities[spec["entity"]])
+
+            for column, (kind, source) in spec["sums"].items():
+                values = columns[source]
+                weights = np.isfinite(values) if kind == "count" else np.nan_to_num(values)
+                total = self.sums[group][column]
+                if len(total) < size:
+                    total = self.sums[group][column] = np.pad(total, (0, size - len(total)))
+                total += np.bincount(codes, weights=weights, minlength=size)
+
+    def _pair_codes(self, user_codes, product_codes):
+        pairs = (user_codes.astype(np.int64) << PAIR_SHIFT) | product_codes
+        return self.entities["pair"].encode(pairs)
+
+    def update(self, df):
+        users = self.entities["user"].encode(df["user_id"].to_numpy())
+        products = self.entities["product"].encode(df["product_id"].to_numpy())
+        self.integer_scores &= pd.api.types.is_integer_dtype(df["event_score"])
+
+        self._accumulate(
+            {
+                "user": users,
+                "product": products,
+                "pair": self._pair_codes(users, products) if self.pairs else None,
+            },
+            {
+                source: pd.to_numeric(df[source]).to_numpy(dtype=np.float64, na_value=np.nan)
+                for source in ("event_score", "rating.rate")
+            },
+        )
+        return self
+
+    def merge(self, other):
+        if not len(other.entities["user"]):
+            return self
+
+        # Re-encode the other state's keys into this state's dictionaries
+        users = self.entities["user"].encode(other.entities["user"].values)
+        products = self.entities["product"].encode(other.entities["product"].values)
+        pairs = None
+        if self.pairs:
+            other_pairs = other.entities["pair"].values.to_numpy(dtype=np.int64)
+            pairs = self._pair_codes(
+                users[other_pairs >> PAIR_SHIFT],
+                products[other_pairs & ((1 << PAIR_SHIFT) - 1)],
+            )
+        codes = {"user": users, "product": products, "pair": pairs}
+        self.integer_scores &= other.integer_scores
+
+        for group in self.groups:
+            spec = AGGREGATIONS[group]
+            size = len(self.entities[spec["entity"]])
+            for column in spec["sums"]:
+                total = np.pad(
+                    self.sums[group][column], (0, size - len(self.sums[group][column]))
+                )
+                total += np.bincount(
+                    codes[spec["entity"]],
+                    weights=other.sums[group][column],
+                    minlength=size,
+                )
+                self.sums[group][column] = total
+        return self
+
+    # Key columns, plus the row order that sorts them the way groupby would
+    def _keys(self, entity):
+        values = self.entities[entity].values
+        if entity != "pair":
+            column = "user_id" if entity == "user" else "product_id"
+            return {column: values}, self.entities[entity].order()
+
+        pairs = values.to_numpy(dtype=np.int64)
+        users = pairs >> PAIR_SHIFT
+        products = pairs & ((1 << PAIR_SHIFT) - 1)
+        sort_key = (
+            self.entities["user"].ranks()[users] * len(self.entities["product"])
+            + self.entities["product"].ranks()[products]
+        )
+        order = np.argsort(sort_key)
+        return {
+            "user_id": self.entities["user"].values[users],
+            "product_id": self.entities["product"].values[products],
+        }, order
+
+    def to_frame(self, group):
+        spec = AGGREGATIONS[group]
+        keys, order = self._keys(spec["entity"])
+        df = pd.DataFrame(keys)
+        size = len(df)
+
+        for column, (kind, source) in spec["sums"].items():
+            values = np.pad(
+                self.sums[group][column], (0, size - len(self.sums[group][column]))
+            )
+            if kind == "count" or (source == "event_score" and self.integer_scores):
+                values = values.round().astype(np.int64)
+            df[column] = values
+
+        for column, (numerator, denominator) in MEANS[group].items():
+            df[column] = df[numerator] / df[denominator].replace(0, np.nan)
+
+        return df.iloc[order].reset_index(drop=True)[COLUMNS[group]]
+
+    def to_frames(self):
+        return {group: self.to_frame(group) for group in self.groups}
+
+
+def aggregate_chunk(df):
+    return FeatureAggregator().update(df)
+
+
+def iter_chunks(path, chunksize=CHUNK_SIZE):
+    return pd.read_csv(path, usecols=INPUT_COLUMNS, chunksize=chunksize)
+
+
+def aggregate_csv(path, chunksize=CHUNK_SIZE, max_workers=1,
+                  max_pending=None):
+    aggregator = FeatureAggregator()
+
+    if max_workers == 1:
+        for chunk in iter_chunks(path, chunksize):
+            aggregator.update(chunk)
+        return aggregator
+
+    # Workers aggregate chunks independently; states are merged in input order.
+    # At most max_pending chunks are read ahead, so memory stays bounded
+    # however large the input is
+    max_pending = max_pending or 2 * max_workers
+    chunks = iter_chunks(path, chunksize)
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        pending = deque(
+            executor.submit(aggregate_chunk, chunk)
+            for chunk in islice(chunks, max_pending)
+        )
+        while pending:
+            aggregator.merge(pending.popleft().result())
+            for chunk in islice(chunks, 1):
+                pending.append(executor.submit(aggregate_chunk, chunk))
+    return aggregator
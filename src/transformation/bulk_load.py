@@ -0,0 +1,91 @@
+import io
+import time
+
+from src.feature_store.registry import FEATURE_REGISTRY
+
+CHUNK_ROWS = 100_000
+
+
+def registry_keys(table_name, version="v1"):
+    for spec in FEATURE_REGISTRY[version].values():
+        if spec["source"] == table_name:
+            return spec["keys"]
+    return []
+
+
+def _copy_chunks(conn, table, df, chunk_rows):
+    cursor = conn.connection.dbapi_connection.cursor()
+    columns = ", ".join(df.columns)
+    sql = f"COPY {table} ({columns}) FROM STDIN WITH (FORMAT csv)"
+
+    for start in range(0, len(df), chunk_rows):
+        buffer = io.StringIO()
+        df.iloc[start:start + chunk_rows].to_csv(buffer, index=False, header=False)
+        buffer.seek(0)
+
+        # psycopg2 exposes copy_expert, psycopg 3 a copy() context manager
+        if hasattr(cursor, "copy_expert"):
+            cursor.copy_expert(sql, buffer)
+        else:
+            with cursor.copy(sql) as copy:
+                copy.write(buffer.getvalue())
+
+
+def _insert_chunks(conn, table, df, chunk_rows):
+    cursor = conn.connection.dbapi_connection.cursor()
+    placeholders = ", ".join("?" * len(df.columns))
+    sql = f"INSERT INTO {table} ({', '.join(df.columns)}) VALUES ({placeholders})"
+
+    for start in range(0, len(df), chunk_rows):
+        chunk = df.iloc[start:start + chunk_rows].astype(object)
+        cursor.executemany(
+            sql, chunk.where(chunk.notna(), None).itertuples(index=False, name=None)
+        )
+
+
+def bulk_load(df, table_name, engine, keys=None, chunk_rows=CHUNK_ROWS):
+    from sqlalchemy import text
+
+    keys = registry_keys(table_name) if keys is None else keys
+    staging = f"{table_name}_staging"
+    index = f"{table_name}_keys_uidx"
+    postgres = engine.dialect.name == "postgresql"
+
+    start = time.perf_counter()
+
+    with engine.begin() as conn:
+        conn.execute(text(f"DROP TABLE IF EXISTS {staging}"))
+        # Let pandas derive the column types, then stream the rows in
+        df.head(0).to_sql(staging, conn, index=False)
+
+        if postgres:
+            _copy_chunks(conn, staging, df, chunk_rows)
+        else:
+            _insert_chunks(conn, staging, df, chunk_rows)
+
+        if keys and postgres:
+            # Build the index before the swap so the table is never unindexed
+            conn.execute(text(
+                f"CREATE UNIQUE INDEX {index}_new ON {staging} ({', '.join(keys)})"
+            ))
+            conn.execute(text(f"ANALYZE {staging}"))
+
+        # Transactional DDL: readers see the old table until this commits
+        conn.execute(text(f"DROP TABLE IF EXISTS {table_name}"))
+        conn.execute(text(f"ALTER TABLE {staging} RENAME TO {table_name}"))
+
+        if keys and postgres:
+            conn.execute(text(f"ALTER INDEX {index}_new RENAME TO {index}"))
+        elif keys:
+            # SQLite cannot rename indexes, so index after the rename
+            conn.execute(text(
+                f"CREATE UNIQUE INDEX {index} ON {table_name} ({', '.join(keys)})"
+            ))
+
+    elapsed = time.perf_counter() - start
+    return {
+        "table": table_name,
+        "rows": len(df),
+        "seconds": elapsed,
+        "rows_per_second": len(df) / elapsed if elapsed else float("inf"),
+    }
@@ -1,74 +1,201 @@
+import argparse
+from datetime import datetime
 import pandas as pd
-from sqlalchemy import create_engine
 from pathlib import Path
-from src.utils.config_loader import load_paths, load_db_config
+from src.utils.config_loader import load_paths
+from src.utils.hashing import file_digest
+from src.utils.db import get_engine
+from src.feature_store import online_store
+from src.feature_store.get_features import invalidate_cache
+from src.transformation.bulk_load import bulk_load
+from src.transformation.aggregation import CHUNK_SIZE, FeatureAggregator, aggregate_csv
 
 paths = load_paths()
 
 PROCESSED_FILE = Path(paths["processed"]) / "prepared_interactions.csv"
+# Rows appended by the last preparation run only
+DELTA_FILE = Path(paths["processed"]) / "prepared_interactions_delta.csv"
+# Digests of the input files already merged into the feature tables
+BATCH_TABLE = "feature_batches"
+
+
+# Counts and sums are stored next to the features so that partial aggregates
+# can be merged; means are always derived from the merged state
+UPSERT_SPECS = {
+    "user_features": {
+        "keys": ["user_id"],
+        "sums": ["total_interactions", "total_interaction_score"],
+        "derived": {
+            "avg_interaction_score":
+                "CAST({total_interaction_score} AS DOUBLE PRECISION)"
+                " / NULLIF({total_interactions}, 0)",
+        },
+    },
+    "item_features": {
+        "keys": ["product_id"],
+        "sums": [
+            "total_interactions", "total_interaction_score",
+            "rating_sum", "rating_count",
+        ],
+        "derived": {
+            "avg_interaction_score":
+                "CAST({total_interaction_score} AS DOUBLE PRECISION)"
+                " / NULLIF({total_interactions}, 0)",
+            "avg_rating":
+                "{rating_sum} / NULLIF({rating_count}, 0)",
+        },
+    },
+    "user_item_features": {
+        "keys": ["user_id", "product_id"],
+        "sums": ["interaction_count", "total_interaction_score"],
+        "derived": {},
+    },
+}
+
+
+def load_data(path=PROCESSED_FILE):
+    return pd.read_csv(path)
 
-paths = load_paths()
-db = load_db_config()["postgres"]
-
-DB_URL = (
-    f"postgresql://{db['user']}:{db['password']}"
-    f"@{db['host']}:{db['port']}/{db['database']}"
-)
 
-engine = create_engine(DB_URL)
+def generate_user_features(df):
+    return FeatureAggregator(["user_features"]).update(df).to_frame("user_features")
 
 
-def load_data():
-    return pd.read_csv(PROCESSED_FILE)
+def generate_item_features(df):
+    return FeatureAggregator(["item_features"]).update(df).to_frame("item_features")
 
 
-def generate_user_features(df):
-    return (
-        df.groupby("user_id")
-        .agg(
-            total_interactions=("event_score", "count"),
-            avg_interaction_score=("event_score", "mean")
-        )
-        .reset_index()
-    )
+def generate_user_item_features(df):
+    return FeatureAggregator(["user_item_features"]).update(df).to_frame("user_item_features")
 
 
-def generate_item_features(df):
-    return (
-        df.groupby("product_id")
-        .agg(
-            total_interactions=("event_score", "count"),
-            avg_interaction_score=("event_score", "mean"),
-            avg_rating=("rating.rate", "mean")
-        )
-        .reset_index()
+def write_to_db(df, table_name):
+    stats = bulk_load(df, table_name, get_engine())
+    online_store.discard(table_name)
+    invalidate_cache(group=table_name)
+    print(
+        f"Loaded {stats['rows']} rows into {table_name} "
+        f"({stats['rows_per_second']:.0f} rows/s)"
     )
 
 
-def generate_user_item_features(df):
-    return (
-        df.groupby(["user_id", "product_id"])
-        .agg(
-            interaction_count=("event_score", "count"),
-            total_interaction_score=("event_score", "sum")
-        )
-        .reset_index()
+def _upsert(conn, df, table_name):
+    from sqlalchemy import text
+
+    spec = UPSERT_SPECS[table_name]
+    keys, sums, derived = spec["keys"], spec["sums"], spec["derived"]
+    staging = f"{table_name}_staging"
+
+    insert_columns = keys + sums + list(derived)
+    select_exprs = keys + sums + [
+        expr.format(**{c: c for c in sums}) for expr in derived.values()
+    ]
+    merged = {c: f"({table_name}.{c} + EXCLUDED.{c})" for c in sums}
+    updates = [f"{c} = {merged[c]}" for c in sums] + [
+        f"{c} = {expr.format(**merged)}" for c, expr in derived.items()
+    ]
+
+    conn.execute(text(
+        f"CREATE UNIQUE INDEX IF NOT EXISTS {table_name}_keys_uidx "
+        f"ON {table_name} ({', '.join(keys)})"
+    ))
+    df[keys + sums].to_sql(staging, conn, if_exists="replace", index=False)
+    # "WHERE true" keeps SQLite from parsing ON CONFLICT as a join clause
+    conn.execute(text(
+        f"INSERT INTO {table_name} ({', '.join(insert_columns)}) "
+        f"SELECT {', '.join(select_exprs)} FROM {staging} WHERE true "
+        f"ON CONFLICT ({', '.join(keys)}) DO UPDATE SET {', '.join(updates)}"
+    ))
+    conn.execute(text(f"DROP TABLE {staging}"))
+
+
+def upsert_to_db(df, table_name):
+    # One transaction: readers see either the old or the merged rows, never a gap
+    with get_engine().begin() as conn:
+        _upsert(conn, df, table_name)
+
+    online_store.discard(table_name)
+    invalidate_cache(group=table_name)
+
+
+def _claim_batch(conn, batch_id, source):
+    from sqlalchemy import text
+
+    conn.execute(text(
+        f"CREATE TABLE IF NOT EXISTS {BATCH_TABLE} "
+        f"(batch_id TEXT PRIMARY KEY, source TEXT, applied_at TEXT)"
+    ))
+    applied = conn.execute(
+        text(f"SELECT 1 FROM {BATCH_TABLE} WHERE batch_id = :batch_id"),
+        {"batch_id": batch_id},
+    ).first()
+    if applied:
+        return False
+
+    # Recorded before the merge: a concurrent run of the same batch conflicts
+    # on the primary key instead of merging it a second time
+    conn.execute(
+        text(f"INSERT INTO {BATCH_TABLE} VALUES (:batch_id, :source, :applied_at)"),
+        {
+            "batch_id": batch_id,
+            "source": source,
+            "applied_at": datetime.now().isoformat(),
+        },
     )
+    return True
 
 
-def write_to_db(df, table_name):
-    df.to_sql(table_name, engine, if_exists="replace", index=False)
+def apply_batch(features, batch_id, source):
+    # The batch is merged into every table and recorded in one transaction,
+    # so it is applied exactly once or not at all
+    with get_engine().begin() as conn:
+        if not _claim_batch(conn, batch_id, source):
+            return False
+        for table_name, df in features.items():
+            _upsert(conn, df, table_name)
 
+    for table_name in features:
+        online_store.discard(table_name)
+        invalidate_cache(group=table_name)
+    return True
 
-if __name__ == "__main__":
-    df = load_data()
 
-    user_features = generate_user_features(df)
-    item_features = generate_item_features(df)
-    user_item_features = generate_user_item_features(df)
+def mark_batch_applied(path, source):
+    # A full load already contains the current delta; merging it later would
+    # count its rows twice
+    if Path(path).exists():
+        with get_engine().begin() as conn:
+            _claim_batch(conn, file_digest(path), source)
 
-    write_to_db(user_features, "user_features")
-    write_to_db(item_features, "item_features")
-    write_to_db(user_item_features, "user_item_features")
 
-    print("Feature tables successfully created in PostgreSQL")
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--incremental", action="store_true")
+    parser.add_argument("--input", default=None)
+    parser.add_argument("--chunksize", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--workers", type=int, default=1)
+    args = parser.parse_args()
+
+    # Merging the full prepared file into existing tables would count every
+    # earlier row twice, so incremental runs default to the last delta
+    if args.input is None:
+        args.input = DELTA_FILE if args.incremental else PROCESSED_FILE
+
+    if args.incremental and not Path(args.input).exists():
+        print(f"No new interactions to merge: {args.input} does not exist")
+        raise SystemExit(0)
+
+    # All three feature groups come out of one chunked pass over the input
+    features = aggregate_csv(args.input, args.chunksize, args.workers).to_frames()
+
+    if args.incremental:
+        if apply_batch(features, file_digest(args.input), str(args.input)):
+            print("Feature tables incrementally updated in PostgreSQL")
+        else:
+            print(f"{args.input} has already been merged, nothing to do")
+    else:
+        for table_name, df in features.items():
+            write_to_db(df, table_name)
+        if Path(args.input) == PROCESSED_FILE:
+            mark_batch_applied(DELTA_FILE, f"full load of {args.input}")
+        print("Feature tables successfully created in PostgreSQL")
@@ -1,9 +1,19 @@
+import copy
+from functools import lru_cache
+
 import yaml
 
-def load_yaml(path):
+
+@lru_cache(maxsize=None)
+def _parse_yaml(path):
     with open(path, "r") as f:
         return yaml.safe_load(f)
 
+
+# The file is parsed once; every caller gets its own copy to modify freely
+def load_yaml(path):
+    return copy.deepcopy(_parse_yaml(path))
+
 def load_paths():
     return load_yaml("config/paths.yaml")
 
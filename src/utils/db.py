@@ -0,0 +1,99 @@
+import threading
+import time
+
+from src.utils.config_loader import load_db_config
+
+POOL_DEFAULTS = {
+    "pool_size": 5,
+    "max_overflow": 10,
+    "pool_timeout": 30,
+    "pool_recycle": 1800,
+    "pool_pre_ping": True,
+}
+
+_engine = None
+_engine_lock = threading.Lock()
+_metrics_lock = threading.Lock()
+_metrics = {
+    "connects": 0,
+    "checkouts": 0,
+    "checkins": 0,
+    "wait_seconds_total": 0.0,
+    "wait_seconds_max": 0.0,
+}
+
+
+def _instrumented_pool():
+    from sqlalchemy.pool import QueuePool
+
+    class InstrumentedQueuePool(QueuePool):
+        def _do_get(self):
+            # Time spent here is time a caller waited for a pooled connection
+            start = time.perf_counter()
+            try:
+                return super()._do_get()
+            finally:
+                waited = time.perf_counter() - start
+                with _metrics_lock:
+                    _metrics["wait_seconds_total"] += waited
+                    _metrics["wait_seconds_max"] = max(
+                        _metrics["wait_seconds_max"], waited
+                    )
+
+    return InstrumentedQueuePool
+
+
+def _count(name):
+    def listener(*args):
+        with _metrics_lock:
+            _metrics[name] += 1
+    return listener
+
+
+def database_url(db):
+    return (
+        f"postgresql://{db['user']}:{db['password']}"
+        f"@{db['host']}:{db['port']}/{db['database']}"
+    )
+
+
+def get_engine():
+    global _engine
+
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                # SQLAlchemy is imported on first use, not at module import
+                from sqlalchemy import create_engine, event
+
+                db = load_db_config()["postgres"]
+                pool = {**POOL_DEFAULTS, **db.get("pool", {})}
+
+                engine = create_engine(
+                    database_url(db), poolclass=_instrumented_pool(), **pool
+                )
+                event.listen(engine, "connect", _count("connects"))
+                event.listen(engine, "checkout", _count("checkouts"))
+                event.listen(engine, "checkin", _count("checkins"))
+                _engine = engine
+
+    return _engine
+
+
+def pool_metrics():
+    with _metrics_lock:
+        metrics = dict(_metrics)
+
+    metrics["wait_seconds_avg"] = (
+        metrics["wait_seconds_total"] / metrics["checkouts"]
+        if metrics["checkouts"] else 0.0
+    )
+    if _engine is not None:
+        pool = _engine.pool
+        metrics.update({
+            "pool_size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "checked_in": pool.checkedin(),
+            "overflow": pool.overflow(),
+        })
+    return metrics
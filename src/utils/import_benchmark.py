@@ -0,0 +1,74 @@
+import argparse
+import json
+import subprocess
+import sys
+
+# Cumulative import-time budget per pipeline entry point, in milliseconds.
+# Budgets leave ~25% headroom over a typical run so machine noise alone does
+# not fail the check
+IMPORT_BUDGETS_MS = {
+    "src.ingestion.ingest_clickstream": 100,
+    "src.ingestion.ingest_products_api": 300,
+    "src.validation.validate_data": 900,
+    "src.preparation.clean_and_prepare": 900,
+    "src.transformation.feature_engineering": 900,
+    "src.transformation.windowed_features": 800,
+    "src.feature_store.demo_feature_retrieval": 1000,
+    "src.models.train_model": 1200,
+    "src.models.evaluate_model": 1200,
+    "src.models.inference": 500,
+}
+
+
+def measure_import_ms(module, repeats=3):
+    timings = []
+    for _ in range(repeats):
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        # Lines look like "import time: self [us] | cumulative | package"
+        for line in result.stderr.splitlines():
+            parts = [part.strip() for part in line.split("|")]
+            if len(parts) == 3 and parts[2] == module:
+                timings.append(int(parts[1]) / 1000)
+
+    # The fastest run is the least disturbed by the rest of the machine
+    return min(timings)
+
+
+def run(budgets=IMPORT_BUDGETS_MS, repeats=3):
+    results = []
+    for module, budget in budgets.items():
+        elapsed = measure_import_ms(module, repeats)
+        results.append({
+            "module": module,
+            "import_ms": round(elapsed, 1),
+            "budget_ms": budget,
+            "within_budget": elapsed <= budget,
+        })
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+
+    results = run(repeats=args.repeats)
+    for row in results:
+        status = "ok" if row["within_budget"] else "OVER BUDGET"
+        print(
+            f"{row['module']:<45} {row['import_ms']:>8.1f} ms "
+            f"(budget {row['budget_ms']} ms) {status}"
+        )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if not all(row["within_budget"] for row in results):
+        sys.exit(1)
@@ -0,0 +1,26 @@
+import json
+import os
+from pathlib import Path
+
+
+def read_json(path, default=None):
+    path = Path(path)
+    if not path.exists():
+        return default
+    with open(path) as f:
+        return json.load(f)
+
+
+def write_json(path, data, compact=False):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    staging = path.with_name(path.name + ".tmp")
+
+    with open(staging, "w") as f:
+        if compact:
+            json.dump(data, f, separators=(",", ":"))
+        else:
+            json.dump(data, f, indent=2)
+
+    # Readers see either the previous file or the complete new one
+    os.replace(staging, path)
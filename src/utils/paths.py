@@ -0,0 +1,43 @@
+from datetime import date
+from pathlib import Path
+
+
+def partition_date(path, root):
+    # Raw partitions live under <root>/YYYY/MM/DD/<file>
+    year, month, day = Path(path).relative_to(root).parts[:3]
+    return date(int(year), int(month), int(day))
+
+
+def list_partitions(root, file_name, start_date=None, end_date=None):
+    root = Path(root)
+    partitions = []
+
+    # Directory names are enough to prune by date; no file is opened here
+    for path in sorted(root.glob(f"*/*/*/{file_name}")):
+        day = partition_date(path, root)
+        if start_date is not None and day < start_date:
+            continue
+        if end_date is not None and day > end_date:
+            continue
+        partitions.append((day, path))
+
+    return partitions
+
+
+def hive_partition_dir(root, day):
+    return Path(root) / f"date={day.isoformat()}"
+
+
+def list_hive_partitions(root, file_name, start_date=None, end_date=None):
+    root = Path(root)
+    partitions = []
+
+    for path in sorted(root.glob(f"date=*/{file_name}")):
+        day = date.fromisoformat(path.parent.name.split("=", 1)[1])
+        if start_date is not None and day < start_date:
+            continue
+        if end_date is not None and day > end_date:
+            continue
+        partitions.append((day, path))
+
+    return partitions
@@ -0,0 +1,203 @@
+import io
+import json
+import os
+from pathlib import Path
+
+import pandas as pd
+
+from src.utils.config_loader import load_paths
+from src.utils.paths import hive_partition_dir, list_hive_partitions, list_partitions
+
+paths = load_paths()
+
+CLICKSTREAM_ROOT = Path(paths["raw"]) / "clickstream"
+PRODUCTS_ROOT = Path(paths["raw"]) / "products"
+CHUNK_SIZE = 100_000
+PARQUET_COMPRESSION = "zstd"
+
+# Open-ended categoricals keep unexpected values visible to validation
+CLICKSTREAM_DTYPES = {
+    "user_id": "category",
+    "product_id": "Int32",
+    "event_type": "category",
+    "device": "category",
+}
+CATEGORICAL_COLUMNS = [
+    column for column, dtype in CLICKSTREAM_DTYPES.items() if dtype == "category"
+]
+
+
+def _merge_partitions(text_partitions, parquet_partitions):
+    # A day converted to Parquet is read from Parquet only
+    by_day = dict(text_partitions)
+    by_day.update(parquet_partitions)
+    return sorted(by_day.items())
+
+
+def clickstream_partitions(start_date=None, end_date=None):
+    return _merge_partitions(
+        list_partitions(CLICKSTREAM_ROOT, "clickstream.csv", start_date, end_date),
+        list_hive_partitions(
+            CLICKSTREAM_ROOT, "clickstream.parquet", start_date, end_date
+        ),
+    )
+
+
+def products_partitions(start_date=None, end_date=None):
+    return _merge_partitions(
+        list_partitions(PRODUCTS_ROOT, "products.json", start_date, end_date),
+        list_hive_partitions(PRODUCTS_ROOT, "products.parquet", start_date, end_date),
+    )
+
+
+def _read_parquet(path, columns=None, chunksize=None):
+    if chunksize is None:
+        return pd.read_parquet(path, columns=columns)
+
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    # Row batches are decoded one at a time, like read_csv(chunksize=...)
+    parquet_file = pq.ParquetFile(path)
+    return (
+        pa.Table.from_batches([batch]).to_pandas()
+        for batch in parquet_file.iter_batches(batch_size=chunksize, columns=columns)
+    )
+
+
+def read_clickstream_partition(path, columns=None, chunksize=None):
+    # Also accepts an open buffer of CSV bytes
+    if str(path).endswith(".parquet"):
+        return _read_parquet(path, columns, chunksize)
+
+    dtypes = {
+        column: dtype for column, dtype in CLICKSTREAM_DTYPES.items()
+        if columns is None or column in columns
+    }
+    parse_dates = (
+        ["timestamp"] if columns is None or "timestamp" in columns else None
+    )
+
+    return pd.read_csv(
+        path,
+        usecols=columns,
+        dtype=dtypes,
+        parse_dates=parse_dates,
+        chunksize=chunksize,
+    )
+
+
+def _skip_rows(chunks, skip):
+    for chunk in chunks:
+        if skip < len(chunk):
+            yield chunk.iloc[skip:]
+        skip = max(skip - len(chunk), 0)
+
+
+def clickstream_delta(path, consumed=None, columns=None, chunksize=None):
+    # `consumed` is the state returned for this partition by the previous run
+    # ({"file", "bytes", "rows"}; a bare row count from older manifests also
+    # works). Returns a new state and the rows added since, in chunks; callers
+    # add the length of each chunk to the state's "rows".
+    path = Path(path)
+    if not isinstance(consumed, dict):
+        consumed = {"rows": consumed or 0}
+    size = path.stat().st_size
+    same_file = consumed.get("file") == path.name
+
+    # An unchanged partition is not opened at all
+    if same_file and consumed.get("bytes") == size:
+        return dict(consumed), []
+
+    state = {"file": path.name, "bytes": size, "rows": consumed.get("rows", 0)}
+
+    if path.suffix != ".csv":
+        # Parquet partitions are rewritten as a whole, so skip by row count
+        chunks = read_clickstream_partition(path, columns, chunksize or CHUNK_SIZE)
+        return state, _skip_rows(chunks, state["rows"])
+
+    # CSV partitions only grow: read from the stored byte offset, or from the
+    # first row (skipping by row count) when no offset was stored yet
+    offset = consumed.get("bytes", 0) if same_file else 0
+    with open(path, "rb") as f:
+        header = f.readline()
+        f.seek(max(offset, len(header)))
+        tail = f.read()
+    # A row that is still being appended is left for the next run
+    tail = tail[:tail.rfind(b"\n") + 1]
+    state["bytes"] = max(offset, len(header)) + len(tail)
+    if not tail:
+        return state, []
+
+    chunks = read_clickstream_partition(
+        io.BytesIO(header + tail), columns, chunksize or CHUNK_SIZE
+    )
+    return state, _skip_rows(chunks, 0 if offset else state["rows"])
+
+
+def read_products_partition(path, columns=None):
+    if Path(path).suffix == ".parquet":
+        return _read_parquet(path, columns)
+
+    with open(path) as f:
+        df = pd.json_normalize(json.load(f))
+    return df if columns is None else df[columns]
+
+
+def iter_clickstream(start_date=None, end_date=None, columns=None,
+                     chunksize=CHUNK_SIZE):
+    for _, path in clickstream_partitions(start_date, end_date):
+        yield from read_clickstream_partition(path, columns, chunksize)
+
+
+def load_clickstream(start_date=None, end_date=None, columns=None,
+                     chunksize=CHUNK_SIZE):
+    chunks = list(iter_clickstream(start_date, end_date, columns, chunksize))
+    if not chunks:
+        return pd.DataFrame(columns=columns or list(CLICKSTREAM_DTYPES) + ["timestamp"])
+
+    df = pd.concat(chunks, ignore_index=True)
+
+    # Chunks carry different category sets, which concat widens to object
+    for column in CATEGORICAL_COLUMNS:
+        if column in df.columns:
+            df[column] = df[column].astype("category")
+    return df
+
+
+def load_products(start_date=None, end_date=None, columns=None):
+    frames = [
+        read_products_partition(path, columns)
+        for _, path in products_partitions(start_date, end_date)
+    ]
+    if not frames:
+        return pd.DataFrame(columns=columns)
+    return pd.concat(frames, ignore_index=True)
+
+
+def write_parquet_partition(df, root, day, file_name):
+    target_dir = hive_partition_dir(root, day)
+    target_dir.mkdir(parents=True, exist_ok=True)
+    target = target_dir / file_name
+    staging = target.with_suffix(".parquet.tmp")
+
+    df.to_parquet(staging, index=False, compression=PARQUET_COMPRESSION)
+    # Readers never see a half-written partition
+    os.replace(staging, target)
+    return target
+
+
+def clickstream_to_parquet(df, day):
+    typed = df.astype({
+        column: dtype for column, dtype in CLICKSTREAM_DTYPES.items()
+        if column in df.columns
+    })
+    typed["timestamp"] = pd.to_datetime(typed["timestamp"])
+    return write_parquet_partition(typed, CLICKSTREAM_ROOT, day, "clickstream.parquet")
+
+
+def products_to_parquet(products, day):
+    # Nested fields are flattened the same way the JSON readers do it
+    return write_parquet_partition(
+        pd.json_normalize(products), PRODUCTS_ROOT, day, "products.parquet"
+    )
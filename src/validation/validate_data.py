@@ -1,11 +1,20 @@
-import json
-import pandas as pd
+import argparse
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table
-from reportlab.lib.styles import getSampleStyleSheet
+
+import numpy as np
+import pandas as pd
 
 from src.utils.config_loader import load_paths
+from src.utils.hashing import file_digest
+from src.utils.json_store import read_json, write_json
 from src.utils.logger import get_logger
+from src.utils.raw_reader import (
+    clickstream_partitions,
+    products_partitions,
+    read_clickstream_partition,
+    read_products_partition,
+)
 
 paths = load_paths()
 
@@ -14,54 +23,112 @@ REPORT_FILE = Path("reports") / "4_data_quality_report.pdf"
 
 logger = get_logger("data_validation", LOG_FILE)
 RAW_PATH = Path(paths["raw"])
+CACHE_FILE = Path(paths["validated"]) / "validation_cache.json"
+CHUNK_SIZE = 100_000
+# Bump when a check changes so cached results are recomputed
+CHECKS_VERSION = 2
+
+VALID_EVENTS = ["view", "click", "add_to_cart"]
+VALID_DEVICES = ["web", "mobile"]
+PRODUCT_COLUMNS = ["id", "title", "price", "category", "rating.rate"]
+
+
+def load_cache():
+    return read_json(CACHE_FILE, {})
+
+
+def save_cache(cache):
+    write_json(CACHE_FILE, cache)
+
 
+def _count_duplicates(chunk, seen):
+    # Row hashes let duplicates be counted across chunks without keeping rows
+    hashes = pd.util.hash_pandas_object(chunk, index=False).to_numpy()
+    repeated = pd.Series(hashes).duplicated().to_numpy() | np.isin(hashes, seen)
+    return int(repeated.sum()), np.union1d(seen, hashes)
 
-def validate_clickstream():
-    files = RAW_PATH.glob("clickstream/*/*/*/clickstream.csv")
-    results = []
 
-    for file in files:
-        df = pd.read_csv(file)
+def profile_clickstream(path, chunksize=CHUNK_SIZE):
+    counts = dict.fromkeys(
+        ["Rows", "Missing Values", "Duplicates", "Invalid Events", "Invalid Devices"], 0
+    )
+    seen = np.empty(0, dtype=np.uint64)
 
-        results.append({
-            "Dataset": "Clickstream",
-            "File": str(file),
-            "Rows": len(df),
-            "Missing Values": int(df.isnull().sum().sum()),
-            "Duplicates": int(df.duplicated().sum()),
-            "Invalid Events": int(~df["event_type"].isin(["view", "click", "add_to_cart"]).sum()),
-            "Invalid Devices": int(~df["device"].isin(["web", "mobile"]).sum())
-        })
+    for chunk in read_clickstream_partition(path, chunksize=chunksize):
+        duplicates, seen = _count_duplicates(chunk, seen)
+        counts["Rows"] += len(chunk)
+        counts["Missing Values"] += int(chunk.isnull().sum().sum())
+        counts["Duplicates"] += duplicates
+        counts["Invalid Events"] += int((~chunk["event_type"].isin(VALID_EVENTS)).sum())
+        counts["Invalid Devices"] += int((~chunk["device"].isin(VALID_DEVICES)).sum())
 
-    return results
+    return counts
 
 
-def validate_products():
-    files = RAW_PATH.glob("products/*/*/*/products.json")
-    results = []
+def profile_products(path):
+    df = read_products_partition(path, PRODUCT_COLUMNS)
 
-    for file in files:
-        with open(file) as f:
-            data = json.load(f)
+    return {
+        "Rows": len(df),
+        "Missing Values": int(df[["id", "title", "price", "category"]].isnull().sum().sum()),
+        "Duplicates": int(df["id"].duplicated().sum()),
+        "Invalid Price": int((df["price"] <= 0).sum()),
+        "Invalid Rating": int(
+            (~df["rating.rate"].between(1, 5)).sum()
+        )
+    }
 
-        df = pd.json_normalize(data)
 
-        results.append({
-            "Dataset": "Products",
-            "File": str(file),
-            "Rows": len(df),
-            "Missing Values": int(df[["id", "title", "price", "category"]].isnull().sum().sum()),
-            "Duplicates": int(df["id"].duplicated().sum()),
-            "Invalid Price": int((df["price"] <= 0).sum()),
-            "Invalid Rating": int(
-                (~df["rating.rate"].between(1, 5)).sum()
-            )
-        })
+def validate_partitions(dataset, partitions, profile, cache, max_workers=None):
+    digests = {
+        str(path): f"{dataset}:v{CHECKS_VERSION}:{file_digest(path)}"
+        for _, path in partitions
+    }
+    # Unchanged partitions are served from the cache, the rest go to the pool
+    pending = [file for file, key in digests.items() if key not in cache]
 
-    return results
+    if len(pending) > 1:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            profiles = list(executor.map(profile, pending))
+    else:
+        profiles = [profile(file) for file in pending]
+
+    for file, counts in zip(pending, profiles):
+        logger.info(f"Validated {file}")
+        cache[digests[file]] = counts
+
+    return [
+        {"Dataset": dataset, "File": file, **cache[key]}
+        for file, key in digests.items()
+    ]
+
+
+def validate_clickstream(start_date=None, end_date=None, cache=None,
+                         max_workers=None):
+    return validate_partitions(
+        "Clickstream",
+        clickstream_partitions(start_date, end_date),
+        profile_clickstream,
+        load_cache() if cache is None else cache,
+        max_workers,
+    )
+
+
+def validate_products(start_date=None, end_date=None, cache=None,
+                      max_workers=None):
+    return validate_partitions(
+        "Products",
+        products_partitions(start_date, end_date),
+        profile_products,
+        load_cache() if cache is None else cache,
+        max_workers,
+    )
 
 
 def generate_pdf(report_data):
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table
+    from reportlab.lib.styles import getSampleStyleSheet
+
     styles = getSampleStyleSheet()
     doc = SimpleDocTemplate(str(REPORT_FILE))
     elements = []
@@ -94,10 +161,18 @@ def generate_pdf(report_data):
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--max-workers", type=int, default=None)
+    args = parser.parse_args()
+
     logger.info("Starting data profiling and validation")
 
-    clickstream_results = validate_clickstream()
-    product_results = validate_products()
+    cache = load_cache()
+    clickstream_results = validate_clickstream(
+        cache=cache, max_workers=args.max_workers
+    )
+    product_results = validate_products(cache=cache, max_workers=args.max_workers)
+    save_cache(cache)
 
     generate_pdf({
         "Clickstream Data": clickstream_results,